@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Reproducible benchmark matrix for the HTTP mock and the locustfiles.
+
+``run`` starts one headless Locust run per case against HOST, back to back
+and with no think time (THINK_TIME=0) unless ``--rate`` fixes the offered
+load per user, and writes every case's throughput, p50/p99 (from the HDR
+histograms of timing.py), the mock's CPU/RSS (from its /metrics endpoint)
+and Locust's own CPU time into one JSON results file. Locust runs as one
+process, so ``rps_per_locust_core`` (requests per CPU second it used) is
+what one worker core sustains with the ``--client`` in use:
+
+    bench.py run --host http://localhost:8080 --users 50 --run-time 30s --client fast \\
+        --output logs/bench/results.json
+
+``compare`` checks a results file against a baseline and exits 1 when a
+case got slower than the threshold allows:
+
+    bench.py compare bench_baseline.json logs/bench/results.json --threshold 10
+
+Each case's Locust CSV, HDR and log files are kept next to the results
+file, in a directory named after the case.
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+from hdr import Histogram
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Case name -> (locustfile, tag), run in this order. Mutations grow the
+# mock's stores, so they go last and the mock should be restarted between
+# benchmark runs (make locust:bench does).
+CASES = {
+    "http-root": ("locustfile_http.py", "http-root"),
+    "http-login": ("locustfile_http.py", "http-login"),
+    "graphql-query": ("locustfile_graphql.py", "graphql-query"),
+    "graphql-voucher-filter": ("locustfile_graphql.py", "graphql-voucher-filter"),
+    "voucher-query": ("locustfile_voucher.py", "voucher-query"),
+    "graphql-mutation": ("locustfile_graphql.py", "graphql-mutation"),
+}
+
+# Metric -> True if higher is better; compared by relative change
+COMPARED_METRICS = {
+    "rps": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "mock_cpu_ms_per_request": False,
+    "rps_per_locust_core": True,
+}
+
+PROCESS_METRIC = re.compile(r'^(process_cpu_seconds_total|process_resident_memory_bytes)\{[^}]*\} (\S+)$', re.MULTILINE)
+
+
+def scrape_mock(host):
+    """Summed CPU seconds and RSS bytes of the mock's processes (None if no /metrics)"""
+    try:
+        with urllib.request.urlopen(f"{host.rstrip('/')}/metrics", timeout=5) as response:
+            text = response.read().decode("utf-8")
+    except (OSError, ValueError):
+        return None
+    totals = {"process_cpu_seconds_total": 0.0, "process_resident_memory_bytes": 0.0}
+    for name, value in PROCESS_METRIC.findall(text):
+        totals[name] += float(value)
+    return totals
+
+
+def read_totals(json_file):
+    """Request/failure counts and RPS from Locust's final ``--json-file`` stats
+
+    (the stats CSV is written once a second and can miss the last second)
+    """
+    with open(json_file) as f:
+        entries = [entry for entry in json.load(f) if entry["method"] != "Open model"]
+    if not entries:
+        return 0, 0, 0.0
+    requests = sum(entry["num_requests"] for entry in entries)
+    failures = sum(entry["num_failures"] for entry in entries)
+    duration = (max(entry["last_request_timestamp"] or 0 for entry in entries)
+                - min(entry["start_time"] for entry in entries))
+    return requests, failures, requests / duration if duration > 0 else 0.0
+
+
+def read_percentiles(directory):
+    """p50/p99 in ms over all request entries of a case's hdr_histograms.json"""
+    merged = Histogram()
+    with open(os.path.join(directory, "hdr_histograms.json")) as f:
+        for entry in json.load(f)["entries"]:
+            if entry["variant"] == "raw" and entry["type"] != "Open model":
+                merged.merge(Histogram.from_dict(entry))
+    return merged.value_at_percentile(50) / 1000, merged.value_at_percentile(99) / 1000
+
+
+def run_case(name, args, directory):
+    locustfile, tag = CASES[name]
+    case_dir = os.path.join(directory, name)
+    os.makedirs(case_dir, exist_ok=True)
+    csv_prefix = os.path.join(case_dir, "locust")
+    env = dict(os.environ, HTTP_HOST=args.host, HTTP_CLIENT=args.client)
+    if args.rate:
+        env.update(ARRIVAL_RATE=str(args.rate), ARRIVAL_DISTRIBUTION="fixed")
+    else:
+        env.update(ARRIVAL_RATE="0", THINK_TIME="0")
+    command = [
+        sys.executable, "-m", "locust", "-f", os.path.join(BIN_DIR, locustfile),
+        "--headless", "-u", str(args.users), "-r", str(args.spawn_rate or args.users),
+        "-t", args.run_time, "--tags", tag, "--csv", csv_prefix, "--json-file", csv_prefix,
+        "--only-summary",
+        "--logfile", os.path.join(case_dir, "locust.log"), "--exit-code-on-error", "0",
+    ]
+
+    before = scrape_mock(args.host)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    subprocess.run(command, env=env, cwd=case_dir, check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.monotonic() - started
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    after = scrape_mock(args.host)
+    locust_cpu = (children_after.ru_utime + children_after.ru_stime
+                  - children_before.ru_utime - children_before.ru_stime)
+
+    requests, failures, rps = read_totals(f"{csv_prefix}.json")
+    p50, p99 = read_percentiles(case_dir)
+    result = {
+        "requests": requests,
+        "failures": failures,
+        "rps": round(rps, 2),
+        "p50_ms": round(p50, 3),
+        "p99_ms": round(p99, 3),
+        "locust_cpu_seconds": round(locust_cpu, 3),
+        "locust_cpu_percent": round(locust_cpu / elapsed * 100, 1),
+        "rps_per_locust_core": round(requests / locust_cpu, 1) if locust_cpu > 0 else None,
+    }
+    if before is not None and after is not None:
+        cpu = after["process_cpu_seconds_total"] - before["process_cpu_seconds_total"]
+        result.update(
+            mock_cpu_seconds=round(cpu, 3),
+            mock_cpu_percent=round(cpu / elapsed * 100, 1),
+            mock_cpu_ms_per_request=round(cpu * 1000 / requests, 4) if requests else None,
+            mock_rss_bytes=int(after["process_resident_memory_bytes"]),
+        )
+    return result
+
+
+def run(args):
+    names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        sys.exit(f"Unknown case(s) {unknown}; available: {', '.join(CASES)}")
+    directory = os.path.dirname(os.path.abspath(args.output))
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": args.host,
+        "users": args.users,
+        "runTime": args.run_time,
+        "rate": args.rate,
+        "client": args.client,
+        "meta": dict(item.split("=", 1) for item in args.meta),
+        "cases": {},
+    }
+    for name in names:
+        print(f"{name}: {args.users} users for {args.run_time}...", flush=True)
+        results["cases"][name] = case = run_case(name, args, directory)
+        print(f"  {case['rps']:.1f} req/s, p50 {case['p50_ms']:.2f} ms, p99 {case['p99_ms']:.2f} ms, "
+              f"{case['failures']} failure(s), Locust CPU {case['locust_cpu_percent']:.0f}%", flush=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    print(f"Results written to {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+    for key in ("users", "runTime", "rate", "client", "meta"):
+        if baseline.get(key) != results.get(key):
+            print(f"warning: {key} differs (baseline {baseline.get(key)!r}, results {results.get(key)!r})")
+
+    regressions = []
+    print(f"{'case':<24} {'metric':<24} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, case in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            print(f"{name:<24} (not in baseline)")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {metric}")
+            print(f"{name:<24} {metric:<24} {old:>12g} {new:>12g} {change:>+7.1f}%{flag}")
+        if case.get("failures", 0) > base.get("failures", 0):
+            print(f"{name:<24} {'failures':<24} {base.get('failures', 0):>12} {case['failures']:>12}  REGRESSION")
+            regressions.append(f"{name} failures")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:g}%")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark matrix")
+    run_parser.add_argument("--host", default=os.getenv("HTTP_HOST", "http://localhost:8080"))
+    run_parser.add_argument("--users", type=int, default=50)
+    run_parser.add_argument("--spawn-rate", type=float, default=0, help="default: all users at once")
+    run_parser.add_argument("--run-time", default="30s")
+    run_parser.add_argument("--rate", type=float, default=0,
+                            help="task starts per second per user (default 0: no think time)")
+    run_parser.add_argument("--client", choices=("requests", "fast"), default=os.getenv("HTTP_CLIENT", "requests"),
+                            help="Locust HTTP client: requests (HttpUser) or fast (FastHttpUser)")
+    run_parser.add_argument("--cases", help=f"comma-separated subset of: {', '.join(CASES)}")
+    run_parser.add_argument("--meta", action="append", default=[], metavar="KEY=VALUE",
+                            help="record server settings etc. with the results")
+    run_parser.add_argument("--output", required=True, help="results JSON file")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=10,
+                                help="allowed change in percent (default 10)")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Time createTransferVouchers per voucher for 1 to 10,000 inputs per mutation.
+
+Runs bulk mutations through server.execute_graphql (in process, no HTTP),
+with the inputs written inline in the document and passed as variables,
+and prints the parse/resolve/encode time per voucher for each batch size.
+The arguments are parsed in one pass, so the time per voucher should stay
+flat as batches grow (batches of 1 also pay the per-request overhead). The
+parse cache is cleared before every mutation, so each one pays for its
+own parse, and garbage is collected before each batch size.
+
+    python3 bench_bulk_vouchers.py [--sizes 1,10,100,1000,10000] [--vouchers 20000]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+
+import server
+
+INLINE_MUTATION = 'mutation { createTransferVouchers(inputs: [%s]) { id voucherNo } }'
+VARIABLES_MUTATION = (
+    'mutation Create($inputs: [TransferVoucherInput!]!) { createTransferVouchers(inputs: $inputs) { id voucherNo } }'
+)
+INLINE_INPUT = (
+    '{shippingStoreCode: %(shippingStoreCode)d, arrivalStoreCode: %(arrivalStoreCode)d, '
+    'shippingDate: "%(shippingDate)s", planDeliveryDate: "%(planDeliveryDate)s", '
+    'shippingQuantity: "%(shippingQuantity)s", shippingSellingPrice: "%(shippingSellingPrice)s", jan: "%(jan)s"}'
+)
+STAGES = ("parse", "resolve", "encode")
+
+
+def voucher_inputs(count, rng):
+    return [{
+        "shippingStoreCode": rng.choice((2095, 5166, 3000)),
+        "arrivalStoreCode": rng.choice((2095, 5166, 3000)),
+        "shippingDate": "2025-12-01",
+        "planDeliveryDate": "2025-12-05",
+        "shippingQuantity": str(rng.randint(1, 20)),
+        "shippingSellingPrice": str(100 * rng.randint(1, 50)),
+        "jan": f"49{rng.randrange(10 ** 11):011d}",
+    } for _ in range(count)]
+
+
+def run(size, calls, mode, rng):
+    """Stage seconds summed over ``calls`` mutations of ``size`` inputs each"""
+    totals = dict.fromkeys(STAGES + ("request",), 0.0)
+    gc.collect()
+    for _ in range(calls):
+        inputs = voucher_inputs(size, rng)
+        if mode == "inline":
+            query, variables = INLINE_MUTATION % ", ".join(INLINE_INPUT % item for item in inputs), None
+        else:
+            query, variables = VARIABLES_MUTATION, {"inputs": inputs}
+        server.parse_graphql.cache_clear()
+        timings = server.REQUEST_STAGES.timings = {}
+        started = time.perf_counter()
+        body = server.execute_graphql(query, variables)
+        totals["request"] += time.perf_counter() - started
+        server.REQUEST_STAGES.timings = None
+        created = json.loads(body)["data"]["createTransferVouchers"]
+        if len(created) != size:
+            raise SystemExit(f"{mode} x{size}: created {len(created)} vouchers")
+        for stage in STAGES:
+            totals[stage] += timings.get(stage, 0.0)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,100,1000,10000", help="inputs per mutation")
+    parser.add_argument("--vouchers", type=int, default=20000, help="vouchers created per size and mode")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'mode':<10} {'inputs':>7} {'calls':>6} {'parse':>9} {'resolve':>9} {'encode':>9} {'total':>9}  us/voucher")
+    for mode in ("inline", "variables"):
+        for size in map(int, args.sizes.split(",")):
+            calls = max(1, args.vouchers // size)
+            totals = run(size, calls, mode, rng)
+            per_voucher = {stage: seconds * 1e6 / (size * calls) for stage, seconds in totals.items()}
+            print(f"{mode:<10} {size:>7} {calls:>6} {per_voucher['parse']:>9.2f} {per_voucher['resolve']:>9.2f} "
+                  f"{per_voucher['encode']:>9.2f} {per_voucher['request']:>9.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
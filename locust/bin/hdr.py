@@ -0,0 +1,122 @@
+"""HdrHistogram-style latency histogram (standard library only).
+
+Shared by timing.py, which records the Locust request events, and by the
+offline tools (bench.py, logstats.py) that read the ``hdr_histograms.json``
+files it writes.
+"""
+import math
+
+
+class Histogram:
+    """Log-linear histogram of integer microseconds in the HdrHistogram layout.
+
+    Values below 2048 get a bucket each; above that every power of two is
+    split into 1024 linear sub-buckets, so any recorded value is known to
+    3 significant digits (relative error under 0.1%). Buckets are plain
+    counts, so histograms merge by adding them.
+    """
+    SUB_BUCKET_BITS = 11
+    HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def bucket(cls, value):
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        if shift <= 0:
+            return value
+        return (shift << (cls.SUB_BUCKET_BITS - 1)) + (value >> shift)
+
+    @classmethod
+    def highest_equivalent(cls, bucket):
+        """Largest value that falls into ``bucket``"""
+        if bucket < 2 * cls.HALF:
+            return bucket
+        shift = (bucket >> (cls.SUB_BUCKET_BITS - 1)) - 1
+        sub_bucket = bucket - (shift << (cls.SUB_BUCKET_BITS - 1))
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = max(0, int(value))
+        bucket = self.bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def value_at_percentile(self, percentile):
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.highest_equivalent(bucket), self.max)
+        return self.max
+
+    def mean(self):
+        if not self.total:
+            return 0
+        return sum(self.highest_equivalent(bucket) * count for bucket, count in self.counts.items()) / self.total
+
+    def stddev(self):
+        if not self.total:
+            return 0
+        mean = self.mean()
+        return math.sqrt(sum((self.highest_equivalent(bucket) - mean) ** 2 * count
+                             for bucket, count in self.counts.items()) / self.total)
+
+    def to_dict(self):
+        return {"counts": sorted(self.counts.items()), "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for bucket, count in data["counts"]:
+            histogram.counts[bucket] = histogram.counts.get(bucket, 0) + count
+            histogram.total += count
+        histogram.min, histogram.max = data["min"], data["max"]
+        return histogram
+
+    def percentile_distribution(self, ticks_per_half_distance=5):
+        """HdrHistogram ``.hgrm`` text (values in milliseconds)"""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+        if self.total:
+            buckets = sorted(self.counts)
+            cumulative, index, seen = [], 0, 0
+            for bucket in buckets:
+                seen += self.counts[bucket]
+                cumulative.append(seen)
+            level = 0
+            while True:
+                fraction = 1 - 0.5 ** (level / ticks_per_half_distance)
+                rank = max(1, math.ceil(fraction * self.total))
+                while cumulative[index] < rank:
+                    index += 1
+                value = min(self.highest_equivalent(buckets[index]), self.max)
+                inverse = f"{1 / (1 - fraction):14.2f}" if fraction < 1 else ""
+                lines.append(f"{value / 1000:12.3f} {fraction:14.12f} {cumulative[index]:10d} {inverse}")
+                if cumulative[index] == self.total and index == len(buckets) - 1:
+                    break
+                level += 1
+            lines.append(f"{self.max / 1000:12.3f} {1.0:14.12f} {self.total:10d}")
+        lines.append(f"#[Mean    = {self.mean() / 1000:12.3f}, StdDeviation   = {self.stddev() / 1000:12.3f}]")
+        lines.append(f"#[Max     = {(self.max or 0) / 1000:12.3f}, Total count    = {self.total:12d}]")
+        lines.append(f"#[Buckets = {len(self.counts):12d}, SubBuckets     = {self.HALF * 2:12d}]")
+        return "\n".join(lines) + "\n"
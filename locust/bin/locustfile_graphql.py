@@ -1,33 +1,96 @@
-from locust import HttpUser, task, between, tag
+from locust import task, between, tag
+from http_client import encode_json, graphql_encoder, http_user_class, post_json
+from open_model import arrival_wait_time
+import timing  # noqa: F401  (records every request into HDR histograms)
 import os
+import random
 
-class WebsiteUser(HttpUser):
-    wait_time = between(1, 3)
+POSTS_QUERY = """
+    query {
+        posts {
+            id
+            title
+            content
+            authorId
+            createdAt
+            author {
+                id
+                name
+                email
+            }
+        }
+    }
+"""
+POSTS_QUERY_BODY = encode_json({"query": POSTS_QUERY})
+
+encode_posts_page = graphql_encoder("""
+    query Posts($first: Int, $after: String) {
+        posts(first: $first, after: $after) {
+            id
+            title
+            authorId
+            createdAt
+        }
+    }
+""")
+
+encode_voucher_filter = graphql_encoder("""
+    query Vouchers($store: Int, $type: Int, $first: Int) {
+        variousTransferVoucherPrints(shippingStoreCode: $store, voucherType: $type, first: $first) {
+            id
+            voucherNo
+            shippingStoreName
+            arrivalStoreName
+            shippingDate
+            totalShippingQuantity
+        }
+    }
+""")
+VOUCHER_FILTER_STORES = (2095, 5166, 3000)
+VOUCHER_FILTER_TYPES = (30, 20, 10)
+
+
+def encode_voucher_filters(page_size):
+    """Every store/type combination of the voucher filter, encoded"""
+    return [encode_voucher_filter({"store": store, "type": voucher_type, "first": page_size})
+            for store in VOUCHER_FILTER_STORES for voucher_type in VOUCHER_FILTER_TYPES]
+
+
+def encode_create_post(author_id):
+    return encode_json({"query": f"""
+        mutation {{
+            createPost(
+                title: "Load Test Post",
+                content: "This is a test post from Locust",
+                authorId: "{author_id}"
+            ) {{
+                id
+                title
+                content
+                authorId
+                createdAt
+            }}
+        }}
+    """})
+
+
+CREATE_POST_BODIES = [encode_create_post(author_id) for author_id in ("1", "2", "3")]
+
+class WebsiteUser(http_user_class()):
+    wait_time = arrival_wait_time(between(1, 3))
     host = os.getenv("HTTP_HOST", "http://localhost:8080")
     debug_mode = os.getenv("DEBUG_MODE", "false").lower() == "true"
+    page_size = int(os.getenv("GRAPHQL_PAGE_SIZE", "50"))
+    max_pages = int(os.getenv("GRAPHQL_MAX_PAGES", "5"))
+    batch_size = int(os.getenv("GRAPHQL_BATCH_SIZE", "10"))
+    batch_body = encode_json([{"query": POSTS_QUERY}] * batch_size)
+    voucher_filter_bodies = encode_voucher_filters(page_size)
 
     @task
     @tag('graphql-query')
     def graphql_query(self):
         """GraphQL: Query posts (read operation)"""
-        response = self.client.post("/graphql", name="/graphql (query)", json={
-            "query": """
-                query {
-                    posts {
-                        id
-                        title
-                        content
-                        authorId
-                        createdAt
-                        author {
-                            id
-                            name
-                            email
-                        }
-                    }
-                }
-            """
-        })
+        response = post_json(self.client, "/graphql", POSTS_QUERY_BODY, name="/graphql (query)")
 
         # Debug logging
         if self.debug_mode and response.status_code == 200:
@@ -43,26 +106,48 @@ class WebsiteUser(HttpUser):
             except Exception as e:
                 print(f"⚠️  [GraphQL Query] Failed to parse response: {e}", flush=True)
 
+    @task
+    @tag('graphql-query-paged')
+    def graphql_query_paged(self):
+        """GraphQL: Query posts page by page with a cursor (read operation)"""
+        after = None
+        for _ in range(self.max_pages):
+            response = post_json(self.client, "/graphql", encode_posts_page({"first": self.page_size, "after": after}),
+                                 name="/graphql (query page)")
+            if response.status_code != 200:
+                return
+            posts = response.json().get("data", {}).get("posts") or []
+            if self.debug_mode:
+                print(f"✅ [GraphQL Page] Retrieved {len(posts)} post(s) after {after}", flush=True)
+            if len(posts) < self.page_size:
+                return
+            after = posts[-1]["id"]
+
+    @task
+    @tag('graphql-batch')
+    def graphql_batch(self):
+        """GraphQL: Query posts batch_size times in one array-batched request (read operation)"""
+        with post_json(self.client, "/graphql", self.batch_body, name=f"/graphql (batch x{self.batch_size})",
+                       catch_response=True) as response:
+            if response.status_code != 200:
+                return
+            results = response.json()
+            if not isinstance(results, list) or len(results) != self.batch_size:
+                response.failure(f"Expected {self.batch_size} batched results")
+            elif any("errors" in result for result in results):
+                response.failure(f"GraphQL errors: {[result['errors'] for result in results if 'errors' in result]}")
+            elif self.debug_mode:
+                print(f"✅ [GraphQL Batch] Retrieved {len(results)} result(s) in one request", flush=True)
+
+    @task
+    @tag('graphql-voucher-filter')
+    def graphql_voucher_filter(self):
+        """GraphQL: Filter transfer vouchers by shipping store and voucher type (read operation)"""
+        post_json(self.client, "/graphql", random.choice(self.voucher_filter_bodies),
+                  name="/graphql (voucher filter)")
+
     @task
     @tag('graphql-mutation')
     def graphql_mutation(self):
         """GraphQL: Mutation - Create post (write operation)"""
-        import random
-        author_id = random.choice(["1", "2", "3"])
-        self.client.post("/graphql", name="/graphql (mutation)", json={
-            "query": f"""
-                mutation {{
-                    createPost(
-                        title: "Load Test Post",
-                        content: "This is a test post from Locust",
-                        authorId: "{author_id}"
-                    ) {{
-                        id
-                        title
-                        content
-                        authorId
-                        createdAt
-                    }}
-                }}
-            """
-        })
+        post_json(self.client, "/graphql", random.choice(CREATE_POST_BODIES), name="/graphql (mutation)")
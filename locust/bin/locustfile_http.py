@@ -1,8 +1,16 @@
-from locust import HttpUser, task, between, tag
+from locust import task, between, tag
+from http_client import encode_json, http_user_class, post_json
+from open_model import arrival_wait_time
+import timing  # noqa: F401  (records every request into HDR histograms)
 import os
 
-class WebsiteUser(HttpUser):
-    wait_time = between(1, 3)
+LOGIN_BODY = encode_json({
+    "username": "admin",
+    "password": "password"
+})
+
+class WebsiteUser(http_user_class()):
+    wait_time = arrival_wait_time(between(1, 3))
     host = os.getenv("HTTP_HOST", "http://localhost:8080")
 
     @task
@@ -13,7 +21,4 @@ class WebsiteUser(HttpUser):
     @task
     @tag('http-login')
     def test_login(self):
-        self.client.post("/login", json={
-            "username": "admin",
-            "password": "password"
-        })
+        post_json(self.client, "/login", LOGIN_BODY)
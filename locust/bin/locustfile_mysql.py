@@ -1,9 +1,16 @@
 from locust import User, task, between, events, tag
+from locust.user.task import get_tasks_from_base_classes
+from gevent.lock import BoundedSemaphore, Semaphore
+from mysql_workload import load_workload, task_weights
+from open_model import arrival_wait_time
+from timing import elapsed_ms, now_ns
 import pymysql
 import time
 import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # MySQL Connection Configuration (from environment variables)
 MYSQL_HOST = os.getenv("MYSQL_HOST", "mysql-server")
 MYSQL_PORT = int(os.getenv("MYSQL_PORT", "3306"))
@@ -11,91 +18,241 @@ MYSQL_USER = os.getenv("MYSQL_USER", "testuser")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "testpassword")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE", "testdb")
 MYSQL_CARTESIAN_LIMIT = int(os.getenv("MYSQL_CARTESIAN_LIMIT", "10000"))
+# Streaming mode for mysql-cartesian: read rows through an unbuffered
+# SSCursor, MYSQL_STREAM_BATCH_SIZE at a time, instead of fetchall().
+MYSQL_CARTESIAN_STREAM = os.getenv("MYSQL_CARTESIAN_STREAM", "false").lower() == "true"
+MYSQL_STREAM_BATCH_SIZE = int(os.getenv("MYSQL_STREAM_BATCH_SIZE", "1000"))
+
+# Per-worker connection pool shared by all users of the worker process
+# (0 = off: every user keeps its own connection).
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "0"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
+MYSQL_POOL_MAX_LIFETIME = float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "300"))
+MYSQL_POOL_PING_INTERVAL = float(os.getenv("MYSQL_POOL_PING_INTERVAL", "30"))
+
+# Workload file (JSON, see mysql_workload.py) replacing the built-in tasks
+# with its weighted statements and transactions. Relative to locust/.
+MYSQL_WORKLOAD = os.getenv("MYSQL_WORKLOAD", "")
+
+DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
+
+
+def open_mysql_connection(max_attempts=1, retry_wait=2.0):
+    """Open a MySQL connection, or return None if every attempt failed.
+
+    max_attempts > 1 のときは接続できるまでリトライする（起動時の待ち用）。
+    計測イベント(connect)は最終結果として1回だけ発火する。
+    """
+    start_time = now_ns()
+    last_exc = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            connection = pymysql.connect(
+                host=MYSQL_HOST,
+                port=MYSQL_PORT,
+                user=MYSQL_USER,
+                password=MYSQL_PASSWORD,
+                database=MYSQL_DATABASE,
+                connect_timeout=10,
+                read_timeout=10,
+                write_timeout=10
+            )
+            total_time = elapsed_ms(start_time)
+            events.request.fire(
+                request_type="MySQL",
+                name="connect",
+                response_time=total_time,
+                response_length=0,
+                exception=None,
+                context={}
+            )
+            return connection
+        except Exception as e:
+            last_exc = e
+            if attempt < max_attempts:
+                if DEBUG_MODE:
+                    print(f"⚠️  [MySQL] connect attempt {attempt}/{max_attempts} failed: {e}; retrying in {retry_wait}s")
+                time.sleep(retry_wait)
+
+    total_time = elapsed_ms(start_time)
+    events.request.fire(
+        request_type="MySQL",
+        name="connect",
+        response_time=total_time,
+        response_length=0,
+        exception=last_exc,
+        context={}
+    )
+    logger.error(f"Failed to connect to MySQL after {max_attempts} attempt(s): {last_exc}")
+    return None
+
+
+def row_bytes(row):
+    """Approximate text-protocol payload size of one result row"""
+    size = 0
+    for value in row:
+        if value is None:
+            size += 1
+        elif isinstance(value, (str, bytes)):
+            size += len(value)
+        else:
+            size += len(str(value))
+    return size
+
+
+class ConnectionPool:
+    """Fixed-size MySQL connection pool shared by the users of one worker.
+
+    acquire() は空きスロットを最大 MYSQL_POOL_TIMEOUT 秒待ち、その待ち時間を
+    request_type "MySQL pool" として報告する（クエリ時間と区別するため）。
+    アイドル接続は LIFO で再利用し、MYSQL_POOL_MAX_LIFETIME 秒を超えたものは
+    閉じ、MYSQL_POOL_PING_INTERVAL 秒以上使われていないものは ping で生存確認する。
+    """
+
+    def __init__(self, size, timeout, max_lifetime, ping_interval):
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._slots = BoundedSemaphore(size)
+        self._idle = []  # (connection, opened_at, released_at), most recently used last
+        self._opened = {}  # id(connection) -> opened_at, for checked-out connections
+
+    def acquire(self, max_attempts=1, retry_wait=2.0):
+        """Check out a connection, or return None on pool timeout / connect failure"""
+        start_time = now_ns()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        total_time = elapsed_ms(start_time)
+        events.request.fire(
+            request_type="MySQL pool",
+            name="wait",
+            response_time=total_time,
+            response_length=0,
+            exception=None if acquired else TimeoutError(f"no free connection within {self.timeout}s"),
+            context={}
+        )
+        if not acquired:
+            return None
+
+        connection, opened_at = self._reuse_idle()
+        if connection is None:
+            connection, opened_at = open_mysql_connection(max_attempts, retry_wait), time.monotonic()
+            if connection is None:
+                self._slots.release()
+                return None
+        self._opened[id(connection)] = opened_at
+        return connection
+
+    def _reuse_idle(self):
+        now = time.monotonic()
+        while self._idle:
+            connection, opened_at, released_at = self._idle.pop()
+            if now - opened_at > self.max_lifetime:
+                self._close(connection)
+                continue
+            if now - released_at > self.ping_interval:
+                try:
+                    connection.ping(reconnect=False)
+                except (pymysql.MySQLError, OSError) as e:
+                    logger.debug(f"Dropping dead idle connection: {e}")
+                    if DEBUG_MODE:
+                        print(f"⚠️  [MySQL pool] dropping dead idle connection: {e}")
+                    self._close(connection)
+                    continue
+            return connection, opened_at
+        return None, None
+
+    def release(self, connection, failed=False):
+        """Return a checked-out connection; failed or expired ones are closed instead"""
+        opened_at = self._opened.pop(id(connection))
+        if failed or time.monotonic() - opened_at > self.max_lifetime:
+            self._close(connection)
+        else:
+            self._idle.append((connection, opened_at, time.monotonic()))
+        self._slots.release()
+
+    def close_idle(self):
+        while self._idle:
+            self._close(self._idle.pop()[0])
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except (pymysql.MySQLError, OSError) as e:
+            logger.debug(f"Closing a pooled connection failed: {e}")
+
+
+POOL = ConnectionPool(MYSQL_POOL_SIZE, MYSQL_POOL_TIMEOUT, MYSQL_POOL_MAX_LIFETIME,
+                      MYSQL_POOL_PING_INTERVAL) if MYSQL_POOL_SIZE > 0 else None
+
+
+@events.test_stop.add_listener
+def close_pool(**kwargs):
+    if POOL is not None:
+        POOL.close_idle()
+
 
 class MySQLUser(User):
     """MySQL load testing user with connection pool stress testing"""
-    wait_time = between(0.1, 0.5)
+    wait_time = arrival_wait_time(between(0.1, 0.5))
     # Set host for display in Locust UI
     host = f"mysql://{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
-    debug_mode = os.getenv("DEBUG_MODE", "false").lower() == "true"
+    debug_mode = DEBUG_MODE
 
     def on_start(self):
         """Initialize MySQL connection when user starts.
 
         起動直後は mysql-server がまだ初期化中で接続を拒否する（Connection
         refused）ことがあるため、起動時のみ多めにリトライして待つ。
+        プール使用時は接続を1本借りて返すことで、プールを温めておく。
         """
         self.connection = None
-        self.connect_to_mysql(
-            max_attempts=int(os.getenv("MYSQL_CONNECT_RETRIES", "15")),
-            retry_wait=float(os.getenv("MYSQL_CONNECT_RETRY_WAIT", "2")),
-        )
+        max_attempts = int(os.getenv("MYSQL_CONNECT_RETRIES", "15"))
+        retry_wait = float(os.getenv("MYSQL_CONNECT_RETRY_WAIT", "2"))
+        if POOL is not None:
+            connection = POOL.acquire(max_attempts, retry_wait)
+            if connection:
+                POOL.release(connection)
+        else:
+            self.connect_to_mysql(max_attempts=max_attempts, retry_wait=retry_wait)
+        if WORKLOAD is not None:
+            self.run_workload_setup()
 
     def connect_to_mysql(self, max_attempts=1, retry_wait=2.0):
-        """Establish MySQL connection.
+        """Establish this user's own MySQL connection (used when the pool is off)"""
+        self.connection = open_mysql_connection(max_attempts, retry_wait)
 
-        max_attempts > 1 のときは接続できるまでリトライする（起動時の待ち用）。
-        計測イベント(connect)は最終結果として1回だけ発火する。
-        """
-        start_time = time.time()
-        last_exc = None
-        for attempt in range(1, max_attempts + 1):
-            try:
-                self.connection = pymysql.connect(
-                    host=MYSQL_HOST,
-                    port=MYSQL_PORT,
-                    user=MYSQL_USER,
-                    password=MYSQL_PASSWORD,
-                    database=MYSQL_DATABASE,
-                    connect_timeout=10,
-                    read_timeout=10,
-                    write_timeout=10
-                )
-                total_time = int((time.time() - start_time) * 1000)
-                events.request.fire(
-                    request_type="MySQL",
-                    name="connect",
-                    response_time=total_time,
-                    response_length=0,
-                    exception=None,
-                    context={}
-                )
-                return
-            except Exception as e:
-                last_exc = e
-                if attempt < max_attempts:
-                    if self.debug_mode:
-                        print(f"⚠️  [MySQL] connect attempt {attempt}/{max_attempts} failed: {e}; retrying in {retry_wait}s")
-                    time.sleep(retry_wait)
-
-        total_time = int((time.time() - start_time) * 1000)
-        events.request.fire(
-            request_type="MySQL",
-            name="connect",
-            response_time=total_time,
-            response_length=0,
-            exception=last_exc,
-            context={}
-        )
-        logging.error(f"Failed to connect to MySQL after {max_attempts} attempt(s): {last_exc}")
+    def checkout(self):
+        """Connection for one task: borrowed from POOL, or this user's own one"""
+        if POOL is not None:
+            return POOL.acquire()
+        if not self.connection:
+            self.connect_to_mysql()
+        return self.connection
 
+    def checkin(self, connection, failed=False):
+        """Give back a connection from checkout(); after an error it is not reused"""
+        if POOL is not None:
+            POOL.release(connection, failed)
+        elif failed:
+            self.connection = None
 
     @task
     @tag('mysql-select')
     def select_query(self):
         """Execute SELECT query"""
-        if not self.connection:
-            self.connect_to_mysql()
-            if not self.connection:
-                return
+        connection = self.checkout()
+        if not connection:
+            return
 
-        start_time = time.time()
+        start_time = now_ns()
+        failed = False
         try:
-            with self.connection.cursor() as cursor:
+            with connection.cursor() as cursor:
                 cursor.execute("SELECT * FROM information_schema.COLUMNS LIMIT 10")
                 results = cursor.fetchall()
 
-            total_time = int((time.time() - start_time) * 1000)
+            total_time = elapsed_ms(start_time)
             events.request.fire(
                 request_type="MySQL",
                 name="select",
@@ -114,7 +271,7 @@ class MySQLUser(User):
                     print(f"  ... and {len(results) - 3} more rows")
 
         except Exception as e:
-            total_time = int((time.time() - start_time) * 1000)
+            total_time = elapsed_ms(start_time)
             events.request.fire(
                 request_type="MySQL",
                 name="select",
@@ -125,20 +282,25 @@ class MySQLUser(User):
             )
             if self.debug_mode:
                 print(f"❌ [MySQL Select] Error: {e}")
-            self.connection = None
+            failed = True
+        finally:
+            self.checkin(connection, failed)
 
     @task
     @tag('mysql-cartesian')
     def cartesian_join_query(self):
         """Execute heavy memory consumption cartesian join query"""
-        if not self.connection:
-            self.connect_to_mysql()
-            if not self.connection:
-                return
+        connection = self.checkout()
+        if not connection:
+            return
+        if MYSQL_CARTESIAN_STREAM:
+            self.stream_cartesian_join(connection)
+            return
 
-        start_time = time.time()
+        start_time = now_ns()
+        failed = False
         try:
-            with self.connection.cursor() as cursor:
+            with connection.cursor() as cursor:
                 cursor.execute(f"""
                     SELECT c1.*, c2.COLUMN_NAME as col2
                     FROM information_schema.COLUMNS c1
@@ -147,7 +309,7 @@ class MySQLUser(User):
                 """)
                 results = cursor.fetchall()
 
-            total_time = int((time.time() - start_time) * 1000)
+            total_time = elapsed_ms(start_time)
             events.request.fire(
                 request_type="MySQL",
                 name="cartesian_join",
@@ -157,7 +319,7 @@ class MySQLUser(User):
                 context={}
             )
         except Exception as e:
-            total_time = int((time.time() - start_time) * 1000)
+            total_time = elapsed_ms(start_time)
             events.request.fire(
                 request_type="MySQL",
                 name="cartesian_join",
@@ -166,8 +328,177 @@ class MySQLUser(User):
                 exception=e,
                 context={}
             )
-            self.connection = None
+            failed = True
+        finally:
+            self.checkin(connection, failed)
+
+    def stream_cartesian_join(self, connection):
+        """Cartesian join read through an unbuffered cursor, batch by batch.
+
+        ワーカーのメモリには常に1バッチ分の行しか載らないため、LIMIT を
+        数百万行まで上げても OOM にならない。最初の行が届くまでの時間を
+        "cartesian_join_stream (first row)" (Size = 総行数) として、全体の
+        時間を "cartesian_join_stream" (Size = 総バイト数) として報告する。
+        """
+        start_time = now_ns()
+        first_row_time = None
+        rows = 0
+        total_bytes = 0
+        # Anything but a clean read leaves the unbuffered result half-consumed
+        failed = True
+        try:
+            with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+                cursor.execute(f"""
+                    SELECT c1.*, c2.COLUMN_NAME as col2
+                    FROM information_schema.COLUMNS c1
+                    CROSS JOIN information_schema.COLUMNS c2
+                    LIMIT {MYSQL_CARTESIAN_LIMIT}
+                """)
+                while True:
+                    batch = cursor.fetchmany(MYSQL_STREAM_BATCH_SIZE)
+                    if not batch:
+                        break
+                    if first_row_time is None:
+                        first_row_time = elapsed_ms(start_time)
+                    rows += len(batch)
+                    total_bytes += sum(map(row_bytes, batch))
+
+            total_time = elapsed_ms(start_time)
+            events.request.fire(
+                request_type="MySQL",
+                name="cartesian_join_stream (first row)",
+                response_time=total_time if first_row_time is None else first_row_time,
+                response_length=rows,
+                exception=None,
+                context={}
+            )
+            events.request.fire(
+                request_type="MySQL",
+                name="cartesian_join_stream",
+                response_time=total_time,
+                response_length=total_bytes,
+                exception=None,
+                context={"rows": rows}
+            )
+            if self.debug_mode:
+                print(f"✅ [MySQL Stream] {rows} row(s), {total_bytes} byte(s) in {total_time}ms "
+                      f"(first row after {first_row_time}ms)")
+            failed = False
+        except (pymysql.MySQLError, OSError) as e:
+            total_time = elapsed_ms(start_time)
+            events.request.fire(
+                request_type="MySQL",
+                name="cartesian_join_stream",
+                response_time=total_time,
+                response_length=total_bytes,
+                exception=e,
+                context={"rows": rows}
+            )
+        finally:
+            self.checkin(connection, failed)
+
+    def run_workload_setup(self):
+        """Run the workload's setup statements once per worker process"""
+        global WORKLOAD_SETUP_DONE
+        with WORKLOAD_SETUP_LOCK:
+            if WORKLOAD_SETUP_DONE or not WORKLOAD.setup:
+                return
+            connection = self.checkout()
+            if not connection:
+                return
+            failed = False
+            try:
+                with connection.cursor() as cursor:
+                    for sql in WORKLOAD.setup:
+                        cursor.execute(sql)
+                connection.commit()
+                WORKLOAD_SETUP_DONE = True
+            except pymysql.MySQLError as e:
+                logger.error(f"Workload setup failed: {e}")
+                failed = True
+            finally:
+                self.checkin(connection, failed)
 
+    def run_workload_entry(self, entry):
+        """Execute one workload statement, or all statements of a transaction.
+
+        各ステートメントは名前ごとに request_type "MySQL" で報告し、トランザク
+        ションは全体の時間を request_type "MySQL transaction" でも報告する。
+        """
+        connection = self.checkout()
+        if not connection:
+            return
+
+        start_time = now_ns()
+        rows = 0
+        failed = False
+        try:
+            with connection.cursor() as cursor:
+                if entry.transaction:
+                    connection.begin()
+                for statement in entry.statements:
+                    rows += self.execute_statement(cursor, statement)
+                # Reads too: autocommit is off, and an open transaction would
+                # keep this connection on an old snapshot and hold back purge
+                connection.commit()
+            if entry.transaction:
+                events.request.fire(
+                    request_type="MySQL transaction",
+                    name=entry.name,
+                    response_time=elapsed_ms(start_time),
+                    response_length=rows,
+                    exception=None,
+                    context={}
+                )
+        except pymysql.MySQLError as e:
+            if entry.transaction:
+                events.request.fire(
+                    request_type="MySQL transaction",
+                    name=entry.name,
+                    response_time=elapsed_ms(start_time),
+                    response_length=rows,
+                    exception=e,
+                    context={}
+                )
+            try:
+                connection.rollback()
+            except pymysql.MySQLError as rollback_error:
+                logger.debug(f"Rollback after {entry.name} failed: {rollback_error}")
+            failed = True
+        finally:
+            self.checkin(connection, failed)
+
+    def execute_statement(self, cursor, statement):
+        """Run one workload statement and report it under its name; returns rows read/affected"""
+        start_time = now_ns()
+        try:
+            cursor.execute(statement.sql, statement.params())
+            rows = len(cursor.fetchall()) if statement.read else cursor.rowcount
+        except Exception as e:
+            events.request.fire(
+                request_type="MySQL",
+                name=statement.name,
+                response_time=elapsed_ms(start_time),
+                response_length=0,
+                exception=e,
+                context={}
+            )
+            if self.debug_mode:
+                print(f"❌ [MySQL {statement.name}] Error: {e}")
+            raise
+
+        total_time = elapsed_ms(start_time)
+        events.request.fire(
+            request_type="MySQL",
+            name=statement.name,
+            response_time=total_time,
+            response_length=rows,
+            exception=None,
+            context={}
+        )
+        if self.debug_mode:
+            print(f"✅ [MySQL {statement.name}] {rows} row(s) in {total_time}ms")
+        return rows
 
     def on_stop(self):
         """Clean up MySQL connection when user stops"""
@@ -176,3 +507,21 @@ class MySQLUser(User):
                 self.connection.close()
             except Exception:
                 pass
+
+
+def workload_task(entry):
+    """Locust task running one workload entry, tagged mysql-workload, its name and its tags"""
+    def run(user):
+        user.run_workload_entry(entry)
+    run.__name__ = entry.name
+    return tag("mysql-workload", entry.name, *entry.tags)(run)
+
+
+WORKLOAD = load_workload(MYSQL_WORKLOAD) if MYSQL_WORKLOAD else None
+WORKLOAD_SETUP_LOCK = Semaphore()
+WORKLOAD_SETUP_DONE = False
+if WORKLOAD is not None:
+    # Locust only expands a {task: weight} dict when the class is created
+    MySQLUser.tasks = get_tasks_from_base_classes((), {
+        "tasks": dict(zip(map(workload_task, WORKLOAD.entries), task_weights(WORKLOAD.entries))),
+    })
@@ -0,0 +1,183 @@
+import itertools
+import os
+import random
+
+import timing  # noqa: F401  (records every request into HDR histograms)
+from http_client import JSON_HEADERS, encode_json, graphql_encoder, http_user_class
+from open_model import arrival_wait_time
+
+from locust import between, tag, task
+
+# Authenticated transfer-voucher workload against /api/auth/login and
+# /api/graphql. Each user logs in once and sends its X-Auth-New-Token with
+# every request; when the mock rejects it (expired after AUTH_TOKEN_TTL or
+# evicted), the 401 and the re-login are reported under their own names and
+# the request is retried once with the new token.
+
+# Employee codes are <prefix><number>, numbered per worker process
+VOUCHER_EMPLOYEE_PREFIX = os.getenv("VOUCHER_EMPLOYEE_PREFIX", "EMP")
+# Relative task weights of filter queries vs. bulk createTransferVouchers
+VOUCHER_QUERY_WEIGHT = int(os.getenv("VOUCHER_QUERY_WEIGHT", "9"))
+VOUCHER_MUTATION_WEIGHT = int(os.getenv("VOUCHER_MUTATION_WEIGHT", "1"))
+# Filter mix, "<filter>:<weight>,..." (filters: see VOUCHER_FILTERS)
+VOUCHER_FILTER_WEIGHTS = os.getenv("VOUCHER_FILTER_WEIGHTS", "store:4,store-type:3,route:2,date:1,unissued:1")
+VOUCHER_PAGE_SIZE = int(os.getenv("VOUCHER_PAGE_SIZE", "50"))
+# Vouchers per createTransferVouchers call, one picked at random per call
+VOUCHER_BATCH_SIZES = [int(size) for size in os.getenv("VOUCHER_BATCH_SIZES", "1,10,50").split(",")]
+# Store codes to filter on and create vouchers for (the mock's built-in stores)
+VOUCHER_STORE_CODES = [int(code) for code in os.getenv("VOUCHER_STORE_CODES", "2095,5166,3000").split(",")]
+
+DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
+
+LOGIN_NAME = "/api/auth/login"
+RELOGIN_NAME = "/api/auth/login (re-login)"
+REJECTED_NAME = "/api/graphql (401 token rejected)"
+
+# Shipping dates of the mock's seeded vouchers (SEED_VOUCHERS)
+SHIPPING_DATES = [f"2025-{month:02d}-{day:02d}" for month in (9, 10, 11) for day in range(1, 31)]
+VOUCHER_TYPES = (30, 20, 10)
+
+encode_voucher_query = graphql_encoder("""
+    query Vouchers($shippingStoreCode: Int, $arrivalStoreCode: Int, $shippingDate: String,
+                   $voucherType: Int, $voucherIssuedFlag: Boolean, $first: Int) {
+        variousTransferVoucherPrints(shippingStoreCode: $shippingStoreCode, arrivalStoreCode: $arrivalStoreCode,
+                                     shippingDate: $shippingDate, voucherType: $voucherType,
+                                     voucherIssuedFlag: $voucherIssuedFlag, first: $first) {
+            id
+            voucherNo
+            shippingStoreCode
+            arrivalStoreCode
+            shippingDate
+            voucherType
+            totalShippingQuantity
+            totalShippingSellingAmount
+        }
+    }
+""")
+
+# Filter name -> variables of one query
+VOUCHER_FILTERS = {
+    "store": lambda: {"shippingStoreCode": random.choice(VOUCHER_STORE_CODES)},
+    "store-type": lambda: {"shippingStoreCode": random.choice(VOUCHER_STORE_CODES),
+                           "voucherType": random.choice(VOUCHER_TYPES)},
+    "route": lambda: {"shippingStoreCode": random.choice(VOUCHER_STORE_CODES),
+                      "arrivalStoreCode": random.choice(VOUCHER_STORE_CODES)},
+    "date": lambda: {"shippingDate": random.choice(SHIPPING_DATES)},
+    "unissued": lambda: {"shippingStoreCode": random.choice(VOUCHER_STORE_CODES), "voucherIssuedFlag": False},
+}
+
+# The inputs go in $inputs, so every batch shares one cached parse of the document
+encode_create_vouchers_query = graphql_encoder("""
+    mutation CreateVouchers($inputs: [TransferVoucherInput!]!) {
+        createTransferVouchers(inputs: $inputs) {
+            id
+            voucherNo
+        }
+    }
+""")
+# Distinct pre-encoded createTransferVouchers bodies kept per batch size
+MUTATION_VARIANTS = 8
+
+
+def parse_filter_weights(spec):
+    """"store:4,date:1" -> (["store", "date"], [4, 1])"""
+    names, weights = [], []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition(":")
+        if name not in VOUCHER_FILTERS:
+            raise ValueError(f"Unknown voucher filter {name!r} in VOUCHER_FILTER_WEIGHTS (use {', '.join(VOUCHER_FILTERS)})")
+        names.append(name)
+        weights.append(int(weight or 1))
+    if not names:
+        raise ValueError("VOUCHER_FILTER_WEIGHTS selects no filter")
+    return names, weights
+
+
+def encode_create_vouchers(batch_size, rng):
+    """A createTransferVouchers mutation creating ``batch_size`` vouchers"""
+    inputs = []
+    for _ in range(batch_size):
+        date = rng.choice(SHIPPING_DATES)
+        inputs.append({
+            "shippingStoreCode": rng.choice(VOUCHER_STORE_CODES),
+            "arrivalStoreCode": rng.choice(VOUCHER_STORE_CODES),
+            "shippingDate": date,
+            "planDeliveryDate": date,
+            "shippingQuantity": str(rng.randint(1, 20)),
+            "shippingSellingPrice": str(100 * rng.randint(1, 50)),
+            "jan": f"49{rng.randrange(10 ** 11):011d}",
+        })
+    return encode_create_vouchers_query({"inputs": inputs})
+
+
+FILTER_NAMES, FILTER_WEIGHTS = parse_filter_weights(VOUCHER_FILTER_WEIGHTS)
+# batch size -> pre-encoded mutation bodies
+MUTATION_BODIES = {
+    size: [encode_create_vouchers(size, random.Random(size * MUTATION_VARIANTS + variant))
+           for variant in range(MUTATION_VARIANTS)]
+    for size in VOUCHER_BATCH_SIZES
+}
+EMPLOYEE_NUMBERS = itertools.count(1)
+
+
+class VoucherUser(http_user_class()):
+    wait_time = arrival_wait_time(between(1, 3))
+    host = os.getenv("HTTP_HOST", "http://localhost:8080")
+
+    def on_start(self):
+        self.employee_code = f"{VOUCHER_EMPLOYEE_PREFIX}{next(EMPLOYEE_NUMBERS):05d}"
+        self.login_body = encode_json({"employeeCode": self.employee_code})
+        self.auth_headers = None
+        self.login(LOGIN_NAME)
+
+    def login(self, name):
+        """Log in and cache the token; returns False if no token was issued"""
+        with self.client.post("/api/auth/login", data=self.login_body, headers=JSON_HEADERS, name=name,
+                              catch_response=True) as response:
+            token = response.headers.get("X-Auth-New-Token") if response.status_code == 200 else None
+            if not token:
+                response.failure(f"No auth token for {self.employee_code} (HTTP {response.status_code})")
+                self.auth_headers = None
+                return False
+        self.auth_headers = {**JSON_HEADERS, "X-Auth-Token": token}
+        if DEBUG_MODE:
+            print(f"🔑 [Voucher] {self.employee_code} logged in ({name})", flush=True)
+        return True
+
+    def graphql(self, body, name, retry=True):
+        """POST /api/graphql with the cached token, logging in again once if it was rejected"""
+        if self.auth_headers is None and not self.login(RELOGIN_NAME):
+            return
+        with self.client.post("/api/graphql", data=body, headers=self.auth_headers, name=name,
+                              catch_response=True) as response:
+            rejected = response.status_code == 401
+            if rejected:
+                # Expected once the token expires: counted apart from the operation
+                response.request_meta["name"] = REJECTED_NAME
+                if retry:
+                    response.success()
+                else:
+                    response.failure("Token rejected right after login")
+            elif response.status_code == 200 and b'"errors"' in response.content[:16]:
+                # Only error responses start with "errors"; skips decoding large pages
+                response.failure(f"GraphQL errors: {response.json()['errors']}")
+        if rejected and retry:
+            self.auth_headers = None
+            if self.login(RELOGIN_NAME):
+                self.graphql(body, name, retry=False)
+
+    @task(VOUCHER_QUERY_WEIGHT)
+    @tag('voucher-query')
+    def voucher_query(self):
+        """Filter transfer vouchers with one of the weighted VOUCHER_FILTERS (read operation)"""
+        filter_name = random.choices(FILTER_NAMES, FILTER_WEIGHTS)[0]
+        variables = VOUCHER_FILTERS[filter_name]()
+        variables["first"] = VOUCHER_PAGE_SIZE
+        self.graphql(encode_voucher_query(variables), f"/api/graphql (vouchers by {filter_name})")
+
+    @task(VOUCHER_MUTATION_WEIGHT)
+    @tag('voucher-mutation')
+    def voucher_mutation(self):
+        """createTransferVouchers with a batch of VOUCHER_BATCH_SIZES vouchers (write operation)"""
+        batch_size = random.choice(VOUCHER_BATCH_SIZES)
+        self.graphql(random.choice(MUTATION_BODIES[batch_size]), f"/api/graphql (create x{batch_size})")
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""Post-run aggregation of the timestamped directories under locust/logs.
+
+``summarize`` streams a run's ``locust_stats_history.csv`` (one row per
+second per entry) and writes ``summary.bin``: the history downsampled to
+``--interval``-second points, stored as binary columns, plus a JSON header
+with the run's configuration (target_host.txt) and final per-entry stats
+(locust_stats.csv, with percentiles from hdr_histograms.json when present).
+``--compress`` then gzips the history CSV and report.html in place.
+
+``index`` summarizes every run that has no up-to-date summary.bin and
+writes one row per run to ``runs.csv`` in the log root; reading an existing
+summary only touches its header, so hundreds of runs index in well under a
+second. ``compare`` prints the final stats of chosen runs side by side.
+
+    logstats.py summarize locust/logs/20250101_120000 --interval 10 --compress
+    logstats.py index locust/logs
+    logstats.py compare locust/logs/20250101_120000 locust/logs/20250102_090000
+
+summary.bin layout (little-endian):
+    b"LSUM", u16 version, u32 header length, header JSON (utf-8),
+    then for each header["series"] entry, each header["columns"] column as
+    ``points`` values of its array typecode, in that order.
+"""
+import argparse
+import csv
+import gzip
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+
+from hdr import Histogram
+
+MAGIC = b"LSUM"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+SUMMARY_FILE = "summary.bin"
+INDEX_FILE = "runs.csv"
+
+# Downsampled history columns: (name, array typecode, how a bucket is reduced)
+COLUMNS = (
+    ("offset", "I", "first"),     # seconds since the first history row
+    ("users", "I", "max"),
+    ("rps", "f", "mean"),
+    ("fail_rps", "f", "mean"),
+    ("p50", "f", "max"),          # ms; the history's percentiles are windowed
+    ("p95", "f", "max"),
+    ("p99", "f", "max"),
+    ("max", "f", "max"),
+    ("requests", "q", "last"),    # cumulative totals
+    ("failures", "q", "last"),
+)
+
+# Final-stats columns of runs.csv / compare: (header, key, format)
+TABLE_COLUMNS = (
+    ("Requests", "requests", "{:.0f}"),
+    ("Fail %", "failure_pct", "{:.2f}"),
+    ("RPS", "rps", "{:.1f}"),
+    ("p50 ms", "p50", "{:.2f}"),
+    ("p95 ms", "p95", "{:.2f}"),
+    ("p99 ms", "p99", "{:.2f}"),
+    ("p99.9 ms", "p999", "{:.2f}"),
+)
+
+
+def open_csv(directory, name):
+    """Open ``name`` (or its gzipped copy) in ``directory`` as a text stream, or None"""
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return open(path, newline="")
+    if os.path.exists(path + ".gz"):
+        return gzip.open(path + ".gz", "rt", newline="")
+    return None
+
+
+def source_files(directory):
+    names = ("locust_stats_history.csv", "locust_stats.csv", "hdr_histograms.json", "target_host.txt")
+    return [os.path.join(directory, name + suffix) for name in names for suffix in ("", ".gz")
+            if os.path.exists(os.path.join(directory, name + suffix))]
+
+
+def number(value):
+    try:
+        return float(value)
+    except ValueError:  # "N/A" before the first response
+        return math.nan
+
+
+def read_target_host(directory):
+    """Key/value lines of target_host.txt ("Locust File: ..." -> {"Locust File": ...})"""
+    info = {}
+    try:
+        with open(os.path.join(directory, "target_host.txt")) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if value:
+                    info[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return info
+
+
+class Downsampler:
+    """Reduces one entry's per-second history rows into ``interval``-second buckets"""
+
+    def __init__(self, start, interval):
+        self.start = start
+        self.interval = interval
+        self.columns = {name: array(typecode) for name, typecode, _ in COLUMNS}
+        self._bucket = None
+        self._rows = []
+
+    def add(self, timestamp, values):
+        bucket = (timestamp - self.start) // self.interval
+        if bucket != self._bucket and self._rows:
+            self._flush()
+        self._bucket = bucket
+        self._rows.append(values)
+
+    def _flush(self):
+        rows = self._rows
+        for index, (name, _, reduce) in enumerate(COLUMNS):
+            values = [row[index] for row in rows]
+            if reduce == "first":
+                value = values[0]
+            elif reduce == "last":
+                value = values[-1]
+            elif reduce == "mean":
+                value = sum(values) / len(values)
+            else:
+                known = [v for v in values if not math.isnan(v)]
+                value = max(known) if known else math.nan
+            self.columns[name].append(value)
+        self._rows = []
+
+    def finish(self):
+        if self._rows:
+            self._flush()
+        return self.columns
+
+
+def downsample_history(directory, interval):
+    """Stream the history CSV; returns ({(type, name): columns}, first timestamp, last timestamp)"""
+    stream = open_csv(directory, "locust_stats_history.csv")
+    if stream is None:
+        return {}, None, None
+    series = {}
+    start = end = None
+    with stream:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return {}, None, None
+        field = {name: index for index, name in enumerate(header)}
+        columns = [field[name] for name in (
+            "User Count", "Requests/s", "Failures/s", "50%", "95%", "99%", "100%",
+            "Total Request Count", "Total Failure Count")]
+        for row in reader:
+            timestamp = int(row[field["Timestamp"]])
+            if start is None:
+                start = timestamp
+            end = timestamp
+            key = (row[field["Type"]], row[field["Name"]])
+            sampler = series.get(key)
+            if sampler is None:
+                sampler = series[key] = Downsampler(start, interval)
+            users, rps, fail_rps, p50, p95, p99, peak, requests, failures = (row[index] for index in columns)
+            sampler.add(timestamp, (timestamp - start, int(users), number(rps), number(fail_rps), number(p50),
+                                    number(p95), number(p99), number(peak), int(requests), int(failures)))
+    return {key: sampler.finish() for key, sampler in series.items()}, start, end
+
+
+def final_stats(directory):
+    """Per-entry final stats from locust_stats.csv, percentiles from HDR when available"""
+    entries = {}
+    stream = open_csv(directory, "locust_stats.csv")
+    if stream is not None:
+        with stream:
+            for row in csv.DictReader(stream):
+                requests = int(row["Request Count"])
+                failures = int(row["Failure Count"])
+                entries[(row["Type"], row["Name"])] = {
+                    "type": row["Type"],
+                    "name": row["Name"],
+                    "requests": requests,
+                    "failures": failures,
+                    "failure_pct": failures / requests * 100 if requests else 0.0,
+                    "rps": number(row["Requests/s"]),
+                    "p50": number(row["50%"]),
+                    "p95": number(row["95%"]),
+                    "p99": number(row["99%"]),
+                    "p999": number(row["99.9%"]),
+                    "percentiles": "csv",
+                }
+
+    try:
+        with open(os.path.join(directory, "hdr_histograms.json")) as f:
+            histograms = json.load(f)["entries"]
+    except (OSError, ValueError, KeyError):
+        histograms = []
+    aggregated = Histogram()
+    for entry in histograms:
+        if entry["variant"] != "raw":
+            continue
+        histogram = Histogram.from_dict(entry)
+        if entry["type"] != "Open model":
+            aggregated.merge(histogram)
+        apply_hdr(entries.get((entry["type"], entry["name"])), histogram)
+    if aggregated.total:
+        apply_hdr(entries.get(("", "Aggregated")), aggregated)
+    return list(entries.values())
+
+
+def apply_hdr(entry, histogram):
+    if entry is None:
+        return
+    for key, percentile in (("p50", 50), ("p95", 95), ("p99", 99), ("p999", 99.9)):
+        entry[key] = histogram.value_at_percentile(percentile) / 1000
+    entry["percentiles"] = "hdr"
+
+
+def json_safe(value):
+    """NaN -> None, recursively (JSON has no NaN)"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def summarize(directory, interval=10):
+    """Write ``summary.bin`` for one run directory; returns its header"""
+    series, start, end = downsample_history(directory, interval)
+    info = read_target_host(directory)
+    keys = sorted(series)
+    header = {
+        "run": os.path.basename(os.path.normpath(directory)),
+        "locustFile": info.get("Locust File"),
+        "tags": info.get("Tags"),
+        "workers": info.get("Workers"),
+        "targetHost": info.get("Target Host"),
+        "start": start,
+        "duration": end - start if start is not None else None,
+        "maxUsers": max((max(columns["users"], default=0) for columns in series.values()), default=0),
+        "interval": interval,
+        "entries": final_stats(directory),
+        "columns": [[name, typecode] for name, typecode, _ in COLUMNS],
+        "series": [{"type": key[0], "name": key[1], "points": len(series[key]["offset"])} for key in keys],
+    }
+    encoded = json.dumps(json_safe(header)).encode("utf-8")
+    path = os.path.join(directory, SUMMARY_FILE)
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+        f.write(encoded)
+        for key in keys:
+            for name, _, _ in COLUMNS:
+                column = series[key][name]
+                if sys.byteorder != "little":
+                    column.byteswap()
+                column.tofile(f)
+    os.replace(path + ".tmp", path)
+    return header
+
+
+def read_summary(directory, columns=False):
+    """Header of a run's summary.bin; with ``columns``, also {(type, name): {column: array}}"""
+    with open(os.path.join(directory, SUMMARY_FILE), "rb") as f:
+        magic, version, length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{directory}: not a version {VERSION} {SUMMARY_FILE}")
+        header = json.loads(f.read(length))
+        if not columns:
+            return header
+        series = {}
+        for entry in header["series"]:
+            data = {}
+            for name, typecode in header["columns"]:
+                column = array(typecode)
+                column.fromfile(f, entry["points"])
+                if sys.byteorder != "little":
+                    column.byteswap()
+                data[name] = column
+            series[(entry["type"], entry["name"])] = data
+        return header, series
+
+
+def is_stale(directory):
+    try:
+        built = os.path.getmtime(os.path.join(directory, SUMMARY_FILE))
+    except OSError:
+        return True
+    return any(os.path.getmtime(path) > built for path in source_files(directory))
+
+
+def compress(directory):
+    """Gzip the history CSV and report.html in place (readers accept either)"""
+    for name in ("locust_stats_history.csv", "report.html"):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+            while chunk := source.read(1 << 20):
+                target.write(chunk)
+        os.utime(path + ".gz", (os.path.getatime(path), os.path.getmtime(path)))
+        os.remove(path)
+
+
+def run_directories(root):
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        if os.path.isdir(directory) and any(
+                os.path.exists(os.path.join(directory, f"locust_stats{suffix}"))
+                for suffix in (".csv", ".csv.gz", "_history.csv", "_history.csv.gz")):
+            yield directory
+
+
+def entry_row(entry):
+    cells = []
+    for _, key, fmt in TABLE_COLUMNS:
+        value = entry.get(key)
+        cells.append("" if value is None else fmt.format(value))
+    return cells
+
+
+def find_entry(header, name):
+    for entry in header["entries"]:
+        if entry["name"] == name:
+            return entry
+    return None
+
+
+def print_table(rows):
+    widths = [max(len(str(row[column])) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(str(cell).ljust(width) if index < 2 else str(cell).rjust(width)
+                        for index, (cell, width) in enumerate(zip(row, widths))).rstrip())
+
+
+def index_command(args):
+    rows = []
+    rebuilt = 0
+    for directory in run_directories(args.root):
+        if args.rebuild or is_stale(directory):
+            header = summarize(directory, args.interval)
+            rebuilt += 1
+        else:
+            header = read_summary(directory)
+        entry = find_entry(header, args.name) or {}
+        rows.append([header["run"], header["locustFile"] or "", header["tags"] or "",
+                     header["maxUsers"], header["duration"] if header["duration"] is not None else "",
+                     *entry_row(entry)])
+    columns = ["Run", "Locust File", "Tags", "Users", "Seconds", *(title for title, _, _ in TABLE_COLUMNS)]
+    output = args.output or os.path.join(args.root, INDEX_FILE)
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    if rows:
+        print_table([columns, *rows[-args.limit:]] if args.limit else [columns, *rows])
+    print(f"{len(rows)} run(s) indexed ({rebuilt} summarized) into {output}")
+
+
+def compare_command(args):
+    headers = []
+    for directory in args.runs:
+        if is_stale(directory):
+            headers.append(summarize(directory, args.interval))
+        else:
+            headers.append(read_summary(directory))
+    names = []
+    for header in headers:
+        for entry in header["entries"]:
+            if entry["name"] not in names and (not args.name or entry["name"] in args.name):
+                names.append(entry["name"])
+    rows = [["Entry", "Run", *(title for title, _, _ in TABLE_COLUMNS)]]
+    for name in names:
+        for header in headers:
+            entry = find_entry(header, name)
+            if entry is not None:
+                rows.append([name, header["run"], *entry_row(entry)])
+    print_table(rows)
+
+
+def summarize_command(args):
+    for directory in args.runs:
+        header = summarize(directory, args.interval)
+        points = sum(entry["points"] for entry in header["series"])
+        print(f"{directory}: {len(header['series'])} series, {points} points -> {SUMMARY_FILE}")
+        if args.compress:
+            compress(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summarize_parser = commands.add_parser("summarize", help="write summary.bin for run directories")
+    summarize_parser.add_argument("runs", nargs="+")
+    summarize_parser.add_argument("--compress", action="store_true",
+                                  help="gzip locust_stats_history.csv and report.html afterwards")
+
+    index_parser = commands.add_parser("index", help="summarize all runs and write the cross-run table")
+    index_parser.add_argument("root", nargs="?", default="locust/logs")
+    index_parser.add_argument("--name", default="Aggregated", help="entry to tabulate (default Aggregated)")
+    index_parser.add_argument("--rebuild", action="store_true", help="re-summarize every run")
+    index_parser.add_argument("--limit", type=int, default=0, help="only print the last N runs")
+    index_parser.add_argument("--output", help=f"table file (default <root>/{INDEX_FILE})")
+
+    compare_parser = commands.add_parser("compare", help="final stats of runs side by side")
+    compare_parser.add_argument("runs", nargs="+")
+    compare_parser.add_argument("--name", action="append", help="entry name(s) to show (default all)")
+
+    for subparser in (summarize_parser, index_parser, compare_parser):
+        subparser.add_argument("--interval", type=int, default=10, help="seconds per history point (default 10)")
+
+    args = parser.parse_args()
+    {"summarize": summarize_command, "index": index_command, "compare": compare_command}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Data-driven SQL workloads for locustfile_mysql.py.
+
+A workload file (JSON) describes a weighted query mix:
+
+    {
+      "seed": 42,
+      "read_ratio": 0.8,
+      "setup": ["CREATE TABLE IF NOT EXISTS ..."],
+      "statements": [
+        {"name": "columns_by_table", "weight": 5, "tags": ["hot"],
+         "sql": "SELECT * FROM information_schema.COLUMNS WHERE TABLE_NAME = %(table)s",
+         "params": {"table": {"choice": ["TABLES", "COLUMNS"]}}}
+      ],
+      "transactions": [
+        {"name": "place_order", "weight": 1, "statements": ["insert_order", "update_stock"]}
+      ]
+    }
+
+Statements use pymysql ``%(name)s`` placeholders; each parameter is a
+literal or a generator spec (see PARAM_GENERATORS). A statement is a
+"read" when its SQL starts with SELECT/SHOW/WITH/EXPLAIN/DESCRIBE, unless
+``"kind"`` says otherwise. ``read_ratio`` rescales the weights so that
+reads make up that fraction of the picks (transactions containing a write
+count as writes). Statements with weight 0 only run inside transactions.
+``setup`` statements run once per worker before the first task.
+"""
+import itertools
+import json
+import os
+import random
+import string
+import uuid
+from datetime import date, datetime, timedelta
+
+READ_PREFIXES = ("select", "show", "with", "explain", "describe", "desc")
+
+
+def _choice(spec, rng):
+    values = spec["choice"]
+    weights = spec.get("weights")
+    return lambda: rng.choices(values, weights)[0]
+
+
+def _int(spec, rng):
+    low, high = spec["int"]
+    return lambda: rng.randint(low, high)
+
+
+def _float(spec, rng):
+    low, high = spec["float"]
+    return lambda: rng.uniform(low, high)
+
+
+def _string(spec, rng):
+    length = spec["string"]
+    alphabet = string.ascii_letters + string.digits
+    return lambda: "".join(rng.choices(alphabet, k=length))
+
+
+def _sequence(spec, rng):
+    counter = itertools.count(spec["sequence"])
+    return lambda: next(counter)
+
+
+def _uuid(spec, rng):
+    return lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _date(spec, rng):
+    first, last = (date.fromisoformat(day) for day in spec["date"])
+    span = (last - first).days
+    return lambda: first + timedelta(days=rng.randint(0, span))
+
+
+def _now(spec, rng):
+    return datetime.now
+
+
+# Generator spec key -> factory(spec, rng) returning a zero-argument callable.
+#   {"choice": [...], "weights": [...]}  one of the values
+#   {"int": [low, high]}                 integer, both ends inclusive
+#   {"float": [low, high]}               uniform float
+#   {"string": length}                   random letters and digits
+#   {"sequence": start}                  start, start+1, ... (per worker process)
+#   {"uuid": true}                       random UUID4 text
+#   {"date": ["YYYY-MM-DD", "YYYY-MM-DD"]} date in the range, inclusive
+#   {"now": true}                        current datetime
+PARAM_GENERATORS = {
+    "choice": _choice,
+    "int": _int,
+    "float": _float,
+    "string": _string,
+    "sequence": _sequence,
+    "uuid": _uuid,
+    "date": _date,
+    "now": _now,
+}
+
+
+class WorkloadError(ValueError):
+    """Raised for an invalid workload file"""
+
+
+class Statement:
+    """One named SQL statement with its parameter generators"""
+
+    def __init__(self, name, sql, params, kind, rng):
+        self.name = name
+        self.sql = sql
+        self.read = kind == "read"
+        self._generators = {key: make_generator(name, key, spec, rng) for key, spec in params.items()}
+
+    def params(self):
+        if not self._generators:
+            return None
+        return {key: generate() for key, generate in self._generators.items()}
+
+
+class Entry:
+    """A weighted unit of work: one statement, or a transaction of several"""
+
+    def __init__(self, name, statements, weight, tags, transaction):
+        self.name = name
+        self.statements = statements
+        self.weight = weight
+        self.tags = tags
+        self.transaction = transaction
+
+    @property
+    def read(self):
+        return all(statement.read for statement in self.statements)
+
+
+class Workload:
+    def __init__(self, setup, entries):
+        self.setup = setup
+        self.entries = entries
+
+
+def make_generator(statement, key, spec, rng):
+    if not isinstance(spec, dict):
+        return lambda: spec
+    kinds = [kind for kind in spec if kind in PARAM_GENERATORS]
+    if len(kinds) != 1:
+        raise WorkloadError(f"{statement}: parameter {key!r} needs exactly one of {sorted(PARAM_GENERATORS)}")
+    try:
+        return PARAM_GENERATORS[kinds[0]](spec, rng)
+    except (TypeError, ValueError, KeyError) as e:
+        raise WorkloadError(f"{statement}: bad {kinds[0]!r} generator for {key!r}: {e}") from e
+
+
+def statement_kind(config):
+    kind = config.get("kind")
+    if kind is None:
+        return "read" if config["sql"].lstrip().lower().startswith(READ_PREFIXES) else "write"
+    if kind not in ("read", "write"):
+        raise WorkloadError(f"{config['name']}: kind must be 'read' or 'write'")
+    return kind
+
+
+def parse_workload(config):
+    """Build a Workload from the decoded JSON of a workload file"""
+    rng = random.Random(config.get("seed"))
+    statements = {}
+    entries = []
+    for item in config.get("statements", []):
+        if "name" not in item or "sql" not in item:
+            raise WorkloadError(f"statement needs 'name' and 'sql': {item}")
+        if item["name"] in statements:
+            raise WorkloadError(f"duplicate statement name {item['name']!r}")
+        statement = Statement(item["name"], item["sql"], item.get("params", {}), statement_kind(item), rng)
+        statements[statement.name] = statement
+        weight = item.get("weight", 1)
+        if weight:
+            entries.append(Entry(statement.name, [statement], weight, item.get("tags", []), transaction=False))
+
+    for item in config.get("transactions", []):
+        if "name" not in item or not item.get("statements"):
+            raise WorkloadError(f"transaction needs 'name' and 'statements': {item}")
+        if item["name"] in statements:
+            raise WorkloadError(f"transaction name {item['name']!r} is also a statement name")
+        missing = [name for name in item["statements"] if name not in statements]
+        if missing:
+            raise WorkloadError(f"{item['name']}: unknown statements {missing}")
+        weight = item.get("weight", 1)
+        if weight:
+            entries.append(Entry(item["name"], [statements[name] for name in item["statements"]],
+                                 weight, item.get("tags", []), transaction=True))
+
+    if any(entry.weight < 0 for entry in entries):
+        raise WorkloadError("weights must not be negative")
+    if not entries:
+        raise WorkloadError("workload has no statements or transactions with a weight")
+    if "read_ratio" in config:
+        apply_read_ratio(entries, float(config["read_ratio"]))
+    return Workload(config.get("setup", []), entries)
+
+
+def apply_read_ratio(entries, read_ratio):
+    """Rescale weights so reads are picked with probability ``read_ratio``"""
+    if not 0 <= read_ratio <= 1:
+        raise WorkloadError("read_ratio must be between 0 and 1")
+    reads = sum(entry.weight for entry in entries if entry.read)
+    writes = sum(entry.weight for entry in entries if not entry.read)
+    if (read_ratio and not reads) or (read_ratio < 1 and not writes):
+        raise WorkloadError(f"read_ratio {read_ratio} needs both read and write entries")
+    for entry in entries:
+        if entry.read:
+            entry.weight = entry.weight / reads * read_ratio if reads else 0
+        else:
+            entry.weight = entry.weight / writes * (1 - read_ratio) if writes else 0
+
+
+def load_workload(path):
+    """Read and validate a workload file (relative paths resolve against locust/)"""
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    with open(path, encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise WorkloadError(f"{path}: {e}") from e
+    return parse_workload(config)
+
+
+def task_weights(entries, resolution=1000):
+    """Integer Locust task weights preserving the ratios of the entry weights"""
+    total = sum(entry.weight for entry in entries)
+    return [max(1, round(entry.weight / total * resolution)) if entry.weight else 0 for entry in entries]
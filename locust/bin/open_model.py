@@ -0,0 +1,108 @@
+"""Open-model (constant arrival rate) scheduling shared by the locustfiles.
+
+Closed-loop wait times like ``between(1, 3)`` start the next task only after
+the previous one finished, so when the target slows down the offered load
+drops with it. ``arrival_wait_time`` instead keeps a per-user arrival
+schedule of ARRIVAL_RATE task starts per second (fixed or Poisson
+interarrival times) that does not depend on response times.
+
+When a task finishes after the next arrival was due, the next task starts
+immediately and the delay is reported as request type "Open model" / "lag"
+(coordinated-omission correction data). The intended start time of the
+running task is kept in ``user.scheduled_start`` (perf_counter seconds) and
+its lag in ``user.schedule_lag`` (also readable from the user's greenlet
+through ``current_lag()``). Arrivals more than ARRIVAL_MAX_LAG
+seconds overdue are dropped, reported as "Open model" / "dropped"
+failures, and the schedule restarts from now.
+
+Without ARRIVAL_RATE, THINK_TIME replaces the locustfile's closed-loop wait
+time with a constant (``THINK_TIME=0`` runs tasks back to back, which is
+what the benchmark suite uses to measure saturation throughput).
+"""
+import os
+import random
+from time import perf_counter
+
+from gevent.local import local
+
+from locust import constant, events
+
+# Task starts per second per user (0 = keep the locustfile's closed-loop wait time)
+ARRIVAL_RATE = float(os.getenv("ARRIVAL_RATE", "0"))
+# Interarrival times: "poisson" (exponential) or "fixed"
+ARRIVAL_DISTRIBUTION = os.getenv("ARRIVAL_DISTRIBUTION", "poisson")
+# Arrivals overdue by more than this many seconds are dropped instead of sent late
+ARRIVAL_MAX_LAG = float(os.getenv("ARRIVAL_MAX_LAG", "10"))
+# Constant closed-loop wait time in seconds (empty = keep the locustfile's)
+THINK_TIME = os.getenv("THINK_TIME", "")
+
+# Per-greenlet schedule state of the task being run by the current user
+SCHEDULE = local()
+
+
+def current_lag():
+    """Seconds the task running in this greenlet started behind its schedule"""
+    return getattr(SCHEDULE, "lag", 0.0)
+
+
+def constant_arrival_rate(rate, distribution="poisson", max_lag=10.0):
+    """Return a wait_time function starting ``rate`` tasks per second per user"""
+    if rate <= 0:
+        raise ValueError(f"constant_arrival_rate() requires a positive rate, got: {rate}")
+    if distribution == "poisson":
+        def interarrival():
+            return random.expovariate(rate)
+    elif distribution == "fixed":
+        def interarrival():
+            return 1 / rate
+    else:
+        raise ValueError(f"Unknown arrival distribution {distribution!r} (use 'poisson' or 'fixed')")
+
+    def wait_time_func(user):
+        now = perf_counter()
+        scheduled = getattr(user, "scheduled_start", None)
+        if scheduled is None:
+            # Random phase so users don't start in lockstep
+            scheduled = now + random.uniform(0, 1 / rate)
+        else:
+            scheduled += interarrival()
+
+        lag = now - scheduled
+        if lag > max_lag:
+            dropped = int(lag * rate)
+            events.request.fire(
+                request_type="Open model",
+                name="dropped",
+                response_time=int(lag * 1000),
+                response_length=dropped,
+                exception=RuntimeError(f"{dropped} arrival(s) dropped, worker was {lag:.1f}s behind schedule"),
+                context={}
+            )
+            scheduled, lag = now, 0.0
+        elif lag > 0:
+            events.request.fire(
+                request_type="Open model",
+                name="lag",
+                response_time=lag * 1000,
+                response_length=0,
+                exception=None,
+                context={}
+            )
+
+        user.scheduled_start = scheduled
+        user.schedule_lag = SCHEDULE.lag = max(lag, 0.0)
+        return max(-lag, 0.0)
+
+    return wait_time_func
+
+
+def arrival_wait_time(closed_loop_wait_time):
+    """The open-model wait_time if ARRIVAL_RATE is set, else ``closed_loop_wait_time``
+
+    (or ``constant(THINK_TIME)`` when THINK_TIME is set)
+    """
+    if ARRIVAL_RATE > 0:
+        return constant_arrival_rate(ARRIVAL_RATE, ARRIVAL_DISTRIBUTION, ARRIVAL_MAX_LAG)
+    if THINK_TIME:
+        return constant(float(THINK_TIME))
+    return closed_loop_wait_time
@@ -1,31 +1,329 @@
 #!/usr/bin/env python3
+import argparse
+import asyncio
+import bisect
+import contextlib
+import cProfile
+import email.utils
+import functools
+import gzip
+import hashlib
+import html
+import http
+import http.client
 import http.server
+import io
+import itertools
+import logging
+import math
+import mimetypes
+import mmap
+import multiprocessing
+import posixpath
+import random
+import resource
+import signal
+import socket
 import socketserver
 import json
 import os
+import pstats
 import re
-from datetime import datetime
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
 
 PORT = 8080
 DOCUMENT_ROOT = "."
+# Serving engine: "threaded" (one thread per connection) or "asyncio"
+# (single-threaded event loop with HTTP/1.1 keep-alive). --mode overrides it.
+SERVER_MODE = os.getenv("SERVER_MODE", "threaded")
+# Prefork: number of worker processes sharing PORT via SO_REUSEPORT
+# (1 = single process, 0 = one per CPU). --workers overrides it.
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+
+# Stripe count of the per-row and per-index-value locks of a RowStore
+LOCK_STRIPES = 16
+
+
+class IdAllocator:
+    """Thread-safe row ID counter handing out ``start, start + step, ...``
+
+    In prefork mode worker k of N calls ``stride(k, N)`` so it allocates
+    k, k+N, k+2N... on top of the initial counter, so IDs never collide
+    across workers.
+    """
+
+    def __init__(self, start):
+        self._lock = threading.Lock()
+        self._next = start
+        self._step = 1
+
+    def allocate(self):
+        with self._lock:
+            row_id = self._next
+            self._next += self._step
+        return row_id
+
+    def reserve(self, count):
+        """Skip ``count`` consecutive IDs and return the first one"""
+        with self._lock:
+            first = self._next
+            self._next += count
+        return first
+
+    def stride(self, offset, step):
+        with self._lock:
+            self._next += offset
+            self._step = step
+
+    def peek(self):
+        """The next ID ``allocate()`` would return"""
+        with self._lock:
+            return self._next
+
+    def advance(self, row_id):
+        """Never hand out ``row_id`` or any ID below it (rows reloaded from disk)"""
+        with self._lock:
+            self._next = max(self._next, row_id + 1)
+
+
+class RowStore:
+    """Rows keyed by their ``id`` in insertion order, with optional secondary indexes.
+
+    Each index in ``indexed_fields`` maps a field value to the insertion
+    positions of the rows holding it, in ascending order. ``query()`` starts
+    from the shortest posting list among the requested filters and narrows
+    it by intersecting the other posting lists (or, for much longer ones, by
+    checking the field on each candidate), so filtered reads never scan the
+    whole store. A store can also hold blocks of rows that are only
+    materialized when read: a ``SeedBlock`` of synthetic rows and
+    ``RecordBlock``s of rows reloaded from DATA_DIR.
+
+    Writers lock the stripe of the row id, then the stripe of each
+    ``(field, value)`` posting list they touch, so concurrent inserts only
+    contend on a short append and on equal index values. Readers never take
+    a lock: a posting list only grows in place by appending, anything else
+    swaps in a modified copy, and ``select()`` works on a copy of the
+    positions it matched.
+    """
+    indexed_fields = ()
+
+    def __init__(self, rows=None):
+        self._rows = []
+        self._positions = {}
+        self._indexes = {field: {} for field in self.indexed_fields}
+        self._append_lock = threading.Lock()
+        self._row_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._index_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._blocks = []  # (first position, block), in position order
+        self._block_starts = []
+        for row in (rows or {}).values():
+            self.insert(row)
+
+    def attach_block(self, block):
+        """Append a block of rows, materialized when read, after the current ones"""
+        with self._append_lock:
+            start = len(self._rows)
+            self._rows.extend(itertools.repeat(None, block.count))
+            self._blocks.append((start, block))
+            self._block_starts.append(start)
+            for field, index in self._indexes.items():
+                for position, value in enumerate(block.column(field), start):
+                    posting = index.get(value)
+                    if posting is None:
+                        posting = index[value] = array('q')
+                    posting.append(position)
+
+    def insert(self, row):
+        row_id = row["id"]
+        with self._row_locks[hash(row_id) % LOCK_STRIPES]:
+            position = self._position(row_id)
+            if position is not None:
+                self._unindex(position)
+                self._rows[position] = row
+            else:
+                with self._append_lock:
+                    position = len(self._rows)
+                    self._rows.append(row)
+                self._positions[row_id] = position
+            for field in self._indexes:
+                self._index(field, row[field], position)
+
+    def _index(self, field, value, position):
+        with self._index_locks[hash((field, value)) % LOCK_STRIPES]:
+            index = self._indexes[field]
+            posting = index.get(value)
+            if posting is None:
+                index[value] = array('q', (position,))
+            elif posting[-1] > position:
+                # A concurrent insert with a later position got here first:
+                # swap in a copy rather than shift the list under readers
+                posting = posting[:]
+                posting.insert(bisect.bisect_left(posting, position), position)
+                index[value] = posting
+            else:
+                posting.append(position)
+
+    def _unindex(self, position):
+        for field, index in self._indexes.items():
+            value = self._value(position, field)
+            with self._index_locks[hash((field, value)) % LOCK_STRIPES]:
+                posting = index[value][:]
+                posting.remove(position)
+                if posting:
+                    index[value] = posting
+                else:
+                    del index[value]
+
+    def _position(self, row_id):
+        position = self._positions.get(row_id)
+        if position is None:
+            for start, block in self._blocks:
+                offset = block.offset_of(row_id)
+                if offset is not None:
+                    return start + offset
+        return position
+
+    def _block_at(self, position):
+        start, block = self._blocks[bisect.bisect_right(self._block_starts, position) - 1]
+        return block, position - start
+
+    def _row(self, position):
+        row = self._rows[position]
+        if row is None:
+            block, offset = self._block_at(position)
+            row = block.row(offset)
+        return row
+
+    def _value(self, position, field):
+        row = self._rows[position]
+        if row is None:
+            block, offset = self._block_at(position)
+            return block.value(offset, field)
+        return row[field]
+
+    def _match(self, filters):
+        """Positions of the rows matching all ``field=value`` filters, ascending, as of the call"""
+        if not filters:
+            return range(len(self._rows))
+        postings = []
+        for field, value in filters.items():
+            posting = self._indexes[field].get(value)
+            if not posting:
+                return ()
+            postings.append((len(posting), field, posting))
+        postings.sort(key=lambda entry: entry[0])
+        # Copy the shortest posting list: writers insert into it in place, and
+        # a selection must not change while it is being encoded
+        candidates = postings[0][2][:]
+        for size, field, posting in postings[1:]:
+            if size <= len(candidates) * 8:
+                # Comparable sizes: intersect the posting lists
+                candidates = sorted(set(candidates).intersection(posting))
+            else:
+                # Much larger posting list: check the field on each candidate
+                value = filters[field]
+                candidates = [position for position in candidates if self._value(position, field) == value]
+            if not candidates:
+                return ()
+        return candidates
+
+    def select(self, after=None, offset=0, limit=None, transform=None, **filters):
+        """Lazily select rows matching all ``field=value`` filters, in insertion order.
+
+        ``after`` is the id of the last row of the previous page (keyset
+        cursor); ``offset``/``limit`` then page within the remaining rows.
+        """
+        positions = self._match(filters)
+        start = offset
+        if after is not None:
+            after_position = self._position(after)
+            if after_position is None:
+                raise KeyError(after)
+            start += bisect.bisect_right(positions, after_position)
+        end = None if limit is None else start + limit
+        if start or end is not None:
+            positions = positions[start:end]
+        return RowSelection(self, positions, transform)
+
+    def query(self, **filters):
+        """Return rows matching all ``field=value`` filters, in insertion order"""
+        return list(self.select(**filters))
+
+    def __setitem__(self, row_id, row):
+        self.insert(row)
+
+    def __getitem__(self, row_id):
+        position = self._position(row_id)
+        if position is None:
+            raise KeyError(row_id)
+        return self._row(position)
+
+    def get(self, row_id, default=None):
+        position = self._position(row_id)
+        return default if position is None else self._row(position)
+
+    def __contains__(self, row_id):
+        return self._position(row_id) is not None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def values(self):
+        if not self._blocks:
+            return list(self._rows)
+        return [self._row(position) for position in range(len(self._rows))]
+
 
 # In-memory data store for GraphQL
-USERS = {
+USERS = RowStore({
     "1": {"id": "1", "name": "Alice", "email": "alice@example.com"},
     "2": {"id": "2", "name": "Bob", "email": "bob@example.com"},
     "3": {"id": "3", "name": "Charlie", "email": "charlie@example.com"},
-}
+})
 
-POSTS = {
+POSTS = RowStore({
     "1": {"id": "1", "title": "First Post", "content": "Hello World", "authorId": "1", "createdAt": "2024-01-01T00:00:00Z"},
     "2": {"id": "2", "title": "Second Post", "content": "GraphQL is great", "authorId": "2", "createdAt": "2024-01-02T00:00:00Z"},
     "3": {"id": "3", "title": "Third Post", "content": "Load testing with Locust", "authorId": "1", "createdAt": "2024-01-03T00:00:00Z"},
-}
+})
+
+POST_IDS = IdAllocator(4)
+
+
+class RowSelection:
+    """Rows of a RowStore picked by ``select()``, materialized while iterating"""
+
+    def __init__(self, store, positions, transform=None):
+        self.store = store
+        self.positions = positions
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        row, transform = self.store._row, self.transform
+        for position in self.positions:
+            yield transform(row(position)) if transform else row(position)
+
+
+class VoucherStore(RowStore):
+    """Transfer vouchers, indexed on the variousTransferVoucherPrints filters"""
+    indexed_fields = ("shippingStoreCode", "arrivalStoreCode", "shippingDate", "voucherType", "voucherIssuedFlag")
 
-POST_ID_COUNTER = 4
 
 # In-memory data store for transfer vouchers
-TRANSFER_VOUCHERS = {
+TRANSFER_VOUCHERS = VoucherStore({
     "1": {
         "id": "1",
         "shippingStoreCode": 2095,
@@ -208,307 +506,2207 @@ TRANSFER_VOUCHERS = {
         ],
         "createdAt": "2025-11-03T00:00:00Z"
     },
+})
+
+VOUCHER_IDS = IdAllocator(4)
+
+
+# Synthetic dataset seeding. SEED_* env vars append deterministic generated
+# rows after the hard-coded ones so query tests can run at realistic sizes.
+SEED_USERS = int(os.getenv("SEED_USERS", "0"))
+SEED_POSTS = int(os.getenv("SEED_POSTS", "0"))
+SEED_VOUCHERS = int(os.getenv("SEED_VOUCHERS", "0"))
+SEED_VOUCHER_ITEMS = int(os.getenv("SEED_VOUCHER_ITEMS", "2"))
+SEED_STORES = int(os.getenv("SEED_STORES", "50"))
+SEED_RANDOM_SEED = int(os.getenv("SEED_RANDOM_SEED", "42"))
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(x):
+    """SplitMix64 finalizer: a cheap, well-distributed hash of an integer"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+class SeedBlock(ABC):
+    """Deterministic synthetic rows with consecutive integer ids.
+
+    A row is rebuilt from ``(seed, offset)`` every time it is read; only the
+    columns a store indexes are kept, as flat arrays.
+    """
+
+    def __init__(self, first_id, count, seed):
+        self.first_id = first_id
+        self.count = count
+        self.seed = seed
+
+    def offset_of(self, row_id):
+        try:
+            offset = int(row_id) - self.first_id
+        except (TypeError, ValueError):
+            return None
+        return offset if 0 <= offset < self.count else None
+
+    def row_hash(self, offset):
+        return mix64((self.seed << 32) ^ offset)
+
+    @abstractmethod
+    def row(self, offset):
+        """The row at ``offset``, rebuilt from the seed"""
+
+    def value(self, offset, field):
+        return self.row(offset)[field]
+
+    def column(self, field):
+        return (self.value(offset, field) for offset in range(self.count))
+
+
+class SyntheticUsers(SeedBlock):
+    def row(self, offset):
+        user_id = self.first_id + offset
+        return {"id": str(user_id), "name": f"User {user_id}", "email": f"user{user_id}@example.com"}
+
+
+class SyntheticPosts(SeedBlock):
+    def __init__(self, first_id, count, seed, user_count):
+        super().__init__(first_id, count, seed)
+        self.user_count = user_count
+
+    def row(self, offset):
+        post_id = self.first_id + offset
+        h = self.row_hash(offset)
+        return {
+            "id": str(post_id),
+            "title": f"Post {post_id}",
+            "content": f"Synthetic post {post_id} for large-dataset query tests",
+            "authorId": str(1 + h % self.user_count),
+            "createdAt": f"{SEED_DATES[h >> 16 & 0x7F]}T00:00:00Z",
+        }
+
+
+# Lookup tables shared by the synthetic vouchers: date strings (indexed by
+# day), store codes/names, voucher types and departments.
+SEED_DATES = [(datetime(2025, 8, 31) + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(128)]
+SEED_VOUCHER_TYPES = ((30, "Transfer Type A"), (20, "Transfer Type B"), (10, "Transfer Type C"))
+SEED_DEPARTMENTS = (("D001", "Electronics"), ("D002", "Clothing"), ("D003", "Food"), ("D004", "Household"))
+
+
+def seed_store_names(count):
+    names = {2095: "Tokyo Store", 5166: "Osaka Store", 3000: "Nagoya Store"}
+    for code in range(1001, 1001 + max(0, count - len(names))):
+        names[code] = f"Store {code}"
+    return names
+
+
+class SyntheticVouchers(SeedBlock):
+    """Transfer vouchers with ``items`` transferVoucherItems each.
+
+    The five indexed fields are drawn with ``random.Random(seed)`` into
+    arrays (dates and voucher types as small table indexes); everything else,
+    including the items, is derived from the row hash when materialized.
+    """
+
+    def __init__(self, first_id, count, seed, items, store_count):
+        super().__init__(first_id, count, seed)
+        self.items = items
+        self.store_names = seed_store_names(store_count)
+        codes = list(self.store_names)
+        rng = random.Random(seed)
+        self.shipping_store = array('l', rng.choices(codes, k=count))
+        self.arrival_store = array('l', rng.choices(codes, k=count))
+        self.shipping_day = array('B', rng.choices(range(1, 91), k=count))
+        self.voucher_type = array('B', rng.choices(range(len(SEED_VOUCHER_TYPES)), k=count))
+        self.issued = array('B', rng.choices((0, 1), k=count))
+
+    def value(self, offset, field):
+        if field == "shippingStoreCode":
+            return self.shipping_store[offset]
+        if field == "arrivalStoreCode":
+            return self.arrival_store[offset]
+        if field == "shippingDate":
+            return SEED_DATES[self.shipping_day[offset]]
+        if field == "voucherType":
+            return SEED_VOUCHER_TYPES[self.voucher_type[offset]][0]
+        if field == "voucherIssuedFlag":
+            return bool(self.issued[offset])
+        return self.row(offset)[field]
+
+    def column(self, field):
+        if field == "shippingStoreCode":
+            return self.shipping_store
+        if field == "arrivalStoreCode":
+            return self.arrival_store
+        if field == "shippingDate":
+            return map(SEED_DATES.__getitem__, self.shipping_day)
+        if field == "voucherType":
+            return (SEED_VOUCHER_TYPES[index][0] for index in self.voucher_type)
+        if field == "voucherIssuedFlag":
+            return map(bool, self.issued)
+        return super().column(field)
+
+    def row(self, offset):
+        voucher_id = self.first_id + offset
+        voucher_no = f"V{voucher_id:03d}"
+        h = self.row_hash(offset)
+        issued = bool(self.issued[offset])
+        shipping_day = self.shipping_day[offset]
+        plan_day = shipping_day + 2 + h % 8
+        voucher_type, voucher_type_name = SEED_VOUCHER_TYPES[self.voucher_type[offset]]
+        department_code, department_name = SEED_DEPARTMENTS[(h >> 8) % len(SEED_DEPARTMENTS)]
+
+        items = []
+        for line in range(self.items):
+            ih = mix64(h ^ (line + 1))
+            quantity = 1 + ih % 20
+            cost = 100 * (1 + (ih >> 8) % 50)
+            selling = cost * 3 // 2
+            various = (ih >> 16) % 3
+            jan = f"49{(ih >> 20) % 10 ** 11:011d}"
+            product = f"Product {jan[-4:]}"
+            items.append({
+                "voucherNo": voucher_no,
+                "jan": jan,
+                "productName": product,
+                "shippingQuantity": quantity,
+                "shippingCostPrice": cost,
+                "totalShippingCostPrice": quantity * cost,
+                "shippingSellingPrice": selling,
+                "arrivalSellingPrice": selling,
+                "totalShippingSellingPrice": quantity * selling,
+                "totalArrivalSellingPrice": quantity * selling,
+                "confirmedFlag": issued,
+                "variousVoucherQuantity": various,
+                "variousVoucherCostPrice": cost,
+                "variousTotalCostPrice": various * cost,
+                "variousProductName": f"{product} Variant",
+                "variousTotalShippingSellingPrice": various * selling,
+                "variousTotalArrivalSellingPrice": various * selling,
+            })
+
+        shipping_store = self.shipping_store[offset]
+        arrival_store = self.arrival_store[offset]
+        return {
+            "id": str(voucher_id),
+            "shippingStoreCode": shipping_store,
+            "shippingStoreName": self.store_names[shipping_store],
+            "arrivalStoreCode": arrival_store,
+            "arrivalStoreName": self.store_names[arrival_store],
+            "departmentCode": department_code,
+            "departmentName": department_name,
+            "voucherType": voucher_type,
+            "voucherTypeName": voucher_type_name,
+            "voucherNo": voucher_no,
+            "voucherIssuedFlag": issued,
+            "shippingDate": SEED_DATES[shipping_day],
+            "planDeliveryDate": SEED_DATES[plan_day],
+            "actualDeliveryDate": SEED_DATES[plan_day - (h >> 4) % 2] if issued else None,
+            "printDate": SEED_DATES[shipping_day - 1],
+            "shippingRegistrationUnit": f"Unit {'ABCDEFGH'[(h >> 12) % 8]}",
+            "totalShippingQuantity": sum(item["shippingQuantity"] for item in items),
+            "totalShippingCostPrice": sum(item["totalShippingCostPrice"] for item in items),
+            "totalShippingSellingAmount": sum(item["totalShippingSellingPrice"] for item in items),
+            "totalArrivalSellingAmount": sum(item["totalArrivalSellingPrice"] for item in items),
+            "totalVariousQuantity": sum(item["variousVoucherQuantity"] for item in items),
+            "totalVariousCostPrice": sum(item["variousTotalCostPrice"] for item in items),
+            "totalVariousShippingSellingAmount": sum(item["variousTotalShippingSellingPrice"] for item in items),
+            "totalVariousArrivalSellingAmount": sum(item["variousTotalArrivalSellingPrice"] for item in items),
+            "transferVoucherItems": items,
+            "createdAt": f"{SEED_DATES[shipping_day - 1]}T00:00:00Z",
+        }
+
+
+def current_rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def seed_data_stores():
+    """Append the SEED_* synthetic rows to USERS, POSTS and TRANSFER_VOUCHERS"""
+    if not (SEED_USERS or SEED_POSTS or SEED_VOUCHERS):
+        return
+
+    started = time.perf_counter()
+    rss_before = current_rss_bytes()
+    if SEED_USERS:
+        USERS.attach_block(SyntheticUsers(len(USERS) + 1, SEED_USERS, SEED_RANDOM_SEED))
+    if SEED_POSTS:
+        POSTS.attach_block(SyntheticPosts(POST_IDS.reserve(SEED_POSTS), SEED_POSTS, SEED_RANDOM_SEED, len(USERS)))
+    if SEED_VOUCHERS:
+        TRANSFER_VOUCHERS.attach_block(SyntheticVouchers(
+            VOUCHER_IDS.reserve(SEED_VOUCHERS), SEED_VOUCHERS, SEED_RANDOM_SEED, SEED_VOUCHER_ITEMS, SEED_STORES))
+    elapsed = time.perf_counter() - started
+    rss_after = current_rss_bytes()
+
+    print(f"Seeded {SEED_USERS:,} users, {SEED_POSTS:,} posts, {SEED_VOUCHERS:,} vouchers "
+          f"({SEED_VOUCHER_ITEMS} items each, seed {SEED_RANDOM_SEED}) in {elapsed:.2f}s; "
+          f"RSS {rss_after / 2**20:.1f} MiB (+{(rss_after - rss_before) / 2**20:.1f} MiB)")
+
+
+# Persistence of the rows created by mutations. With DATA_DIR set, every
+# createPost / createTransferVouchers is appended to a write-ahead log before
+# it is applied, and a background thread rewrites a columnar snapshot of the
+# process's rows every DATA_SNAPSHOT_INTERVAL seconds. On startup everything
+# found in DATA_DIR is reloaded, so a read test can run against the rows a
+# previous write test created.
+DATA_DIR = os.getenv("DATA_DIR", "")
+DATA_SNAPSHOT_INTERVAL = float(os.getenv("DATA_SNAPSHOT_INTERVAL", "60"))
+# fsync the log after every mutation (survives power loss, not just a crash)
+DATA_FSYNC = os.getenv("DATA_FSYNC", "false").lower() == "true"
+
+BASE_SNAPSHOT = "base.snap"
+SNAPSHOT_MAGIC = b"MOCKSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEAD = struct.Struct("<8sII")  # magic, version, JSON header length
+WAL_FRAME = struct.Struct("<I")  # length of the JSON record that follows
+
+# Fields of the compact record a created row is persisted as. The row is
+# rebuilt from it when read, like the synthetic seed rows.
+POST_RECORD_FIELDS = ("id", "title", "content", "authorId", "createdAt")
+VOUCHER_RECORD_FIELDS = (
+    "id", "shippingStoreCode", "arrivalStoreCode", "voucherType", "voucherIssuedFlag", "shippingDate",
+    "planDeliveryDate", "shippingQuantity", "shippingSellingPrice", "jan", "printDate", "createdAt",
+)
+VOUCHER_TYPE_NAMES = dict(SEED_VOUCHER_TYPES)
+
+
+def post_row(record):
+    post_id, title, content, author_id, created_at = record
+    return {"id": str(post_id), "title": title, "content": content, "authorId": author_id, "createdAt": created_at}
+
+
+def transfer_voucher_row(record):
+    """The transfer voucher created by createTransferVouchers from its record"""
+    (voucher_id, shipping_store, arrival_store, voucher_type, issued, shipping_date, plan_date,
+     quantity, price, jan, print_date, created_at) = record
+    voucher_no = f"V{voucher_id:03d}"
+    cost = price * 0.6  # 60% of selling price
+    return {
+        "id": str(voucher_id),
+        "shippingStoreCode": shipping_store,
+        "shippingStoreName": "Test Store",
+        "arrivalStoreCode": arrival_store,
+        "arrivalStoreName": "Destination Store",
+        "departmentCode": "D999",
+        "departmentName": "General",
+        "voucherType": voucher_type,
+        "voucherTypeName": VOUCHER_TYPE_NAMES[voucher_type],
+        "voucherNo": voucher_no,
+        "voucherIssuedFlag": issued,
+        "shippingDate": shipping_date,
+        "planDeliveryDate": plan_date,
+        "actualDeliveryDate": None,
+        "printDate": print_date,
+        "shippingRegistrationUnit": "Unit Auto",
+        "totalShippingQuantity": quantity,
+        "totalShippingCostPrice": cost,
+        "totalShippingSellingAmount": price,
+        "totalArrivalSellingAmount": price,
+        "totalVariousQuantity": 0,
+        "totalVariousCostPrice": 0,
+        "totalVariousShippingSellingAmount": 0,
+        "totalVariousArrivalSellingAmount": 0,
+        "transferVoucherItems": [
+            {
+                "voucherNo": voucher_no,
+                "jan": jan,
+                "productName": f"Product {jan}",
+                "shippingQuantity": quantity,
+                "shippingCostPrice": cost / quantity,
+                "totalShippingCostPrice": cost,
+                "shippingSellingPrice": price / quantity,
+                "arrivalSellingPrice": price / quantity,
+                "totalShippingSellingPrice": price,
+                "totalArrivalSellingPrice": price,
+                "confirmedFlag": False,
+                "variousVoucherQuantity": 0,
+                "variousVoucherCostPrice": 0,
+                "variousTotalCostPrice": 0,
+                "variousProductName": "",
+                "variousTotalShippingSellingPrice": 0,
+                "variousTotalArrivalSellingPrice": 0
+            }
+        ],
+        "createdAt": created_at
+    }
+
+
+PersistedTable = namedtuple("PersistedTable", "store ids fields build")
+
+PERSISTED_TABLES = {
+    "posts": PersistedTable(POSTS, POST_IDS, POST_RECORD_FIELDS, post_row),
+    "vouchers": PersistedTable(TRANSFER_VOUCHERS, VOUCHER_IDS, VOUCHER_RECORD_FIELDS, transfer_voucher_row),
 }
 
-VOUCHER_ID_COUNTER = 4
 
-# In-memory store for auth tokens
-AUTH_TOKENS = {}
+class RecordBlock:
+    """Persisted rows held column by column, sorted by their integer id.
+
+    Integer columns are int64 arrays; every other column is dictionary
+    encoded (distinct values plus a uint32 code per row). Rows are rebuilt
+    from their record by ``build`` when read, so a million vouchers take
+    about a hundred bytes each instead of a dict tree.
+    """
+
+    def __init__(self, fields, build, columns):
+        self.fields = fields
+        self.build = build
+        self.columns = columns  # per field: array('q') or (values, array('I') codes)
+        self.field_index = {field: index for index, field in enumerate(fields)}
+        self.ids = columns[0]
+        self.count = len(self.ids)
+
+    @classmethod
+    def from_records(cls, fields, build, records):
+        """Block of ``records`` (tuples starting with the id); the last record of a duplicated id wins"""
+        latest = {}
+        for record in records:
+            latest[record[0]] = record
+        records = sorted(latest.values(), key=lambda record: record[0])
+        columns = []
+        for values in zip(*records) if records else ((),) * len(fields):
+            if all(type(value) is int for value in values):
+                columns.append(array('q', values))
+            else:
+                table = {}
+                codes = array('I', [table.setdefault(value, len(table)) for value in values])
+                columns.append((list(table), codes))
+        return cls(fields, build, columns)
+
+    def offset_of(self, row_id):
+        try:
+            row_id = int(row_id)
+        except (TypeError, ValueError):
+            return None
+        offset = bisect.bisect_left(self.ids, row_id)
+        return offset if offset < self.count and self.ids[offset] == row_id else None
+
+    def _column_value(self, column, offset):
+        if isinstance(column, array):
+            return column[offset]
+        values, codes = column
+        return values[codes[offset]]
+
+    def record(self, offset):
+        return tuple(self._column_value(column, offset) for column in self.columns)
+
+    def records(self):
+        return zip(*(self.column(field) for field in self.fields))
+
+    def row(self, offset):
+        return self.build(self.record(offset))
+
+    def value(self, offset, field):
+        index = self.field_index.get(field)
+        if index is None:
+            return self.row(offset)[field]
+        return self._column_value(self.columns[index], offset)
+
+    def column(self, field):
+        index = self.field_index.get(field)
+        if index is None:
+            return (self.value(offset, field) for offset in range(self.count))
+        column = self.columns[index]
+        if isinstance(column, array):
+            return column
+        values, codes = column
+        return map(values.__getitem__, codes)
+
+
+def write_snapshot(path, blocks):
+    """Atomically write ``{table: RecordBlock}`` to ``path``.
+
+    Layout: SNAPSHOT_HEAD, a JSON header (tables, fields, column offsets and
+    the dictionaries of the encoded columns), then every column as raw
+    native-endian array data aligned to 8 bytes, so a column can be loaded
+    with one ``frombytes`` or used straight from an mmap.
+    """
+    tables, chunks, offset = {}, [], 0
+    for name, block in blocks.items():
+        columns = []
+        for column in block.columns:
+            data = column if isinstance(column, array) else column[1]
+            raw = data.tobytes()
+            if isinstance(column, array):
+                columns.append({"type": data.typecode, "offset": offset})
+            else:
+                columns.append({"type": data.typecode, "offset": offset, "values": column[0]})
+            chunks.append(raw + b"\0" * (-len(raw) % 8))
+            offset += len(chunks[-1])
+        tables[name] = {"count": block.count, "fields": block.fields, "columns": columns}
+    header = json.dumps({"tables": tables}, separators=(",", ":")).encode()
+    header += b" " * (-(SNAPSHOT_HEAD.size + len(header)) % 8)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(SNAPSHOT_HEAD.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        f.writelines(chunks)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(path):
+    """``{table: RecordBlock}`` of a snapshot written by ``write_snapshot``"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, header_length = SNAPSHOT_HEAD.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: not a version {SNAPSHOT_VERSION} snapshot")
+    body = SNAPSHOT_HEAD.size + header_length
+    tables = json.loads(data[SNAPSHOT_HEAD.size:body])["tables"]
+    blocks = {}
+    for name, table in tables.items():
+        persisted = PERSISTED_TABLES[name]
+        if tuple(table["fields"]) != persisted.fields:
+            raise ValueError(f"{path}: {name} fields {table['fields']} differ from {persisted.fields}")
+        columns = []
+        for column in table["columns"]:
+            values = array(column["type"])
+            start = body + column["offset"]
+            values.frombytes(data[start:start + table["count"] * values.itemsize])
+            columns.append((column["values"], values) if "values" in column else values)
+        blocks[name] = RecordBlock(persisted.fields, persisted.build, columns)
+    return blocks
+
+
+def encode_wal_records(table, records):
+    """WAL frames of ``records``: a length, then ``[table, *record]`` as JSON"""
+    frames = []
+    for record in records:
+        payload = json.dumps([table, *record], separators=(",", ":")).encode()
+        frames.append(WAL_FRAME.pack(len(payload)))
+        frames.append(payload)
+    return b"".join(frames)
+
+
+def read_wal(path):
+    """``{table: [record, ...]}`` of a write-ahead log, up to a torn last frame"""
+    with open(path, "rb") as f:
+        data = f.read()
+    records, position = {}, 0
+    while position + WAL_FRAME.size <= len(data):
+        (length,) = WAL_FRAME.unpack_from(data, position)
+        end = position + WAL_FRAME.size + length
+        if end > len(data):
+            break  # written while the server was killed
+        table, *record = json.loads(data[position + WAL_FRAME.size:end])
+        records.setdefault(table, []).append(tuple(record))
+        position = end
+    return records
+
+
+def write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class DataLog:
+    """Write-ahead log and periodic snapshot of the rows this process creates.
+
+    Each server process (prefork worker) writes its own ``worker-<n>.wal``
+    and ``worker-<n>.snap``. A snapshot holds every row the process created
+    since startup; once it is on disk the log is replaced by one holding only
+    the rows appended while the snapshot was written. Replaying snapshot and
+    log after a crash may see a row twice, which loading deduplicates.
+    Does nothing until ``open()`` is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fd = None
+        self._records = {name: [] for name in PERSISTED_TABLES}
+        self._snapshotted = dict.fromkeys(PERSISTED_TABLES, 0)
+        self._stop = threading.Event()
+        self._thread = None
+        self.snapshots = 0
+        self.last_snapshot_seconds = 0.0
+
+    def open(self, directory, writer, interval=DATA_SNAPSHOT_INTERVAL):
+        self._wal_path = os.path.join(directory, f"worker-{writer}.wal")
+        self._snapshot_path = os.path.join(directory, f"worker-{writer}.snap")
+        self._fd = os.open(self._wal_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="data-snapshot", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the snapshot thread and write a final snapshot"""
+        if self._fd is None:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.snapshot()
+        os.close(self._fd)
+        self._fd = None
+
+    def append(self, table, records):
+        """Log ``records`` of ``table`` (see PERSISTED_TABLES) before they are applied"""
+        if self._fd is None or not records:
+            return
+        frames = encode_wal_records(table, records)
+        with self._lock:
+            write_all(self._fd, frames)
+            if DATA_FSYNC:
+                os.fsync(self._fd)
+            self._records[table].extend(records)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.snapshot()
+            except OSError as e:
+                print(f"Snapshot of {self._snapshot_path} failed: {e}", flush=True)
+
+    def snapshot(self):
+        """Write this process's rows to its snapshot and truncate the log to what came after"""
+        with self._lock:
+            counts = {name: len(records) for name, records in self._records.items()}
+            if counts == self._snapshotted:
+                return
+            records = {name: self._records[name][:count] for name, count in counts.items()}
+        started = time.perf_counter()
+        write_snapshot(self._snapshot_path, {
+            name: RecordBlock.from_records(PERSISTED_TABLES[name].fields, PERSISTED_TABLES[name].build, rows)
+            for name, rows in records.items()
+        })
+        with self._lock:
+            temporary = f"{self._wal_path}.tmp"
+            fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+            for name, count in counts.items():
+                write_all(fd, encode_wal_records(name, self._records[name][count:]))
+            os.fsync(fd)
+            os.replace(temporary, self._wal_path)
+            os.close(self._fd)
+            self._fd = fd
+            self._snapshotted = counts
+        self.snapshots += 1
+        self.last_snapshot_seconds = time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            rows = {name: len(records) for name, records in self._records.items()}
+        return {
+            "enabled": self._fd is not None,
+            "createdRows": rows,
+            "snapshots": self.snapshots,
+            "lastSnapshotSeconds": round(self.last_snapshot_seconds, 3),
+        }
+
+
+DATA_LOG = DataLog()
+
+
+def load_persisted_data():
+    """Reload the rows persisted in DATA_DIR and compact them into one snapshot.
+
+    ``base.snap`` is loaded as is; any worker snapshots and logs left by the
+    previous run are merged into a new ``base.snap`` first. Persisted rows
+    are appended after the seed rows and the ID counters skip past them.
+    """
+    started = time.perf_counter()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    base = os.path.join(DATA_DIR, BASE_SNAPSHOT)
+    blocks = read_snapshot(base) if os.path.exists(base) else {}
+    names = sorted(os.listdir(DATA_DIR))
+    leftovers = [os.path.join(DATA_DIR, name) for name in names
+                 if name.startswith("worker-") and name.endswith((".snap", ".wal"))]
+    if leftovers:
+        records = {name: list(block.records()) for name, block in blocks.items()}
+        for path in leftovers:
+            if path.endswith(".snap"):
+                loaded = {name: block.records() for name, block in read_snapshot(path).items()}
+            else:
+                loaded = read_wal(path)
+            for name, rows in loaded.items():
+                records.setdefault(name, []).extend(rows)
+        blocks = {name: RecordBlock.from_records(PERSISTED_TABLES[name].fields, PERSISTED_TABLES[name].build, rows)
+                  for name, rows in records.items()}
+        write_snapshot(base, blocks)
+        for path in leftovers:
+            os.remove(path)
+
+    loaded = {}
+    for name, block in blocks.items():
+        table = PERSISTED_TABLES[name]
+        # IDs below the counter belong to hard-coded or seed rows (e.g. SEED_* grew since the data was written)
+        below = bisect.bisect_left(block.ids, table.ids.peek())
+        if any(str(block.ids[offset]) in table.store for offset in range(below)):
+            kept = [record for record in block.records() if str(record[0]) not in table.store]
+            print(f"Skipped {block.count - len(kept):,} persisted {name} whose IDs are taken by seed rows")
+            block = RecordBlock.from_records(table.fields, table.build, kept)
+        if block.count:
+            table.store.attach_block(block)
+            table.ids.advance(block.ids[-1])
+        loaded[name] = block.count
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {loaded.get('posts', 0):,} posts, {loaded.get('vouchers', 0):,} vouchers from {DATA_DIR} "
+          f"in {elapsed:.2f}s" + (f" (compacted {len(leftovers)} worker files)" if leftovers else ""), flush=True)
+
+
+# Auth tokens expire AUTH_TOKEN_TTL seconds after login (0 = never) and at
+# most AUTH_TOKEN_MAX are kept, so long soak tests don't grow the mock.
+AUTH_TOKEN_TTL = float(os.getenv("AUTH_TOKEN_TTL", "3600"))
+AUTH_TOKEN_MAX = int(os.getenv("AUTH_TOKEN_MAX", "100000"))
+
+
+class TokenStore:
+    """Auth tokens with a TTL and a size bound.
+
+    Tokens are kept in creation order. With a fixed TTL that is also expiry
+    order, so expired tokens are swept from the front on every insert and a
+    full store evicts the token closest to expiring. Supports the subset of
+    the dict interface the handlers use.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.issued = 0
+        self.expired = 0
+        self.evicted = 0
+        self._tokens = OrderedDict()  # token -> expiry (monotonic seconds)
+        self._lock = threading.Lock()
+
+    def __setitem__(self, token, info):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._tokens.pop(token, None)
+            self._tokens[token] = now + self.ttl if self.ttl > 0 else math.inf
+            self.issued += 1
+            while len(self._tokens) > self.maxsize:
+                self._tokens.popitem(last=False)
+                self.evicted += 1
+
+    def _sweep(self, now):
+        tokens = self._tokens
+        while tokens:
+            token, expires = next(iter(tokens.items()))
+            if expires > now:
+                break
+            del tokens[token]
+            self.expired += 1
+
+    def __contains__(self, token):
+        expires = self._tokens.get(token)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        with self._lock:
+            if self._tokens.pop(token, None) is not None:
+                self.expired += 1
+        return False
+
+    def __len__(self):
+        with self._lock:
+            self._sweep(time.monotonic())
+            return len(self._tokens)
+
+    def stats(self):
+        return {"live": len(self), "issued": self.issued, "expired": self.expired,
+                "evicted": self.evicted, "ttl": self.ttl, "maxsize": self.maxsize}
+
+
+class SharedTokenTable:
+    """Auth token set in anonymous shared memory, visible to every prefork worker.
+
+    Created before fork() so all workers map the same pages. Tokens are kept
+    as 64-bit BLAKE2b digests in fixed buckets of ``SLOTS_PER_BUCKET`` slots,
+    after a header of shared counters. Expired slots are reused first; a
+    full bucket evicts its oldest token, so memory use is fixed. Same
+    interface as TokenStore.
+    """
+    SLOT = struct.Struct("<Qd")  # token digest, expiry (epoch seconds)
+    COUNTERS = struct.Struct("<QQQ")  # issued, expired, evicted
+    SLOTS_PER_BUCKET = 8
+
+    def __init__(self, ttl, capacity):
+        self.ttl = ttl
+        self.maxsize = capacity
+        self._buckets = max(1, capacity // self.SLOTS_PER_BUCKET)
+        self._bucket_size = self.SLOTS_PER_BUCKET * self.SLOT.size
+        self._mem = mmap.mmap(-1, self.COUNTERS.size + self._buckets * self._bucket_size)
+        self._lock = multiprocessing.Lock()
+
+    @staticmethod
+    def _digest(token):
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1  # 0 marks an empty slot
+
+    def _bucket_offset(self, digest):
+        return self.COUNTERS.size + (digest % self._buckets) * self._bucket_size
+
+    def _count(self, issued=0, expired=0, evicted=0):
+        counts = self.COUNTERS.unpack_from(self._mem, 0)
+        self.COUNTERS.pack_into(self._mem, 0, counts[0] + issued, counts[1] + expired, counts[2] + evicted)
+
+    def __setitem__(self, token, info):
+        digest = self._digest(token)
+        base = self._bucket_offset(digest)
+        now = time.time()
+        with self._lock:
+            target, oldest = base, None
+            for offset in range(base, base + self._bucket_size, self.SLOT.size):
+                slot_digest, expires = self.SLOT.unpack_from(self._mem, offset)
+                if slot_digest in (0, digest) or expires <= now:
+                    target, oldest = offset, None
+                    if slot_digest and slot_digest != digest:
+                        self._count(expired=1)
+                    break
+                if oldest is None or expires < oldest:
+                    target, oldest = offset, expires
+            if oldest is not None:
+                self._count(evicted=1)
+            self._count(issued=1)
+            self.SLOT.pack_into(self._mem, target, digest, now + self.ttl if self.ttl > 0 else math.inf)
+
+    def __contains__(self, token):
+        digest = self._digest(token)
+        base = self._bucket_offset(digest)
+        with self._lock:
+            for offset in range(base, base + self._bucket_size, self.SLOT.size):
+                slot_digest, expires = self.SLOT.unpack_from(self._mem, offset)
+                if slot_digest == digest:
+                    if expires > time.time():
+                        return True
+                    self.SLOT.pack_into(self._mem, offset, 0, 0.0)
+                    self._count(expired=1)
+                    return False
+        return False
+
+    def __len__(self):
+        now = time.time()
+        with self._lock:
+            slots = self.SLOT.iter_unpack(self._mem[self.COUNTERS.size:])
+            return sum(1 for (digest, expires) in slots if digest and expires > now)
+
+    def stats(self):
+        issued, expired, evicted = self.COUNTERS.unpack_from(self._mem, 0)
+        return {"live": len(self), "issued": issued, "expired": expired,
+                "evicted": evicted, "ttl": self.ttl, "maxsize": self.maxsize}
+
+
+# In-memory store for auth tokens (replaced by a SharedTokenTable in prefork mode)
+AUTH_TOKENS = TokenStore(AUTH_TOKEN_TTL, AUTH_TOKEN_MAX)
+
+
+# GraphQL document parsing. Locust sends the same few query strings over and
+# over, so parsed operations are cached by query text (see /stats).
+GRAPHQL_PARSE_CACHE_SIZE = int(os.getenv("GRAPHQL_PARSE_CACHE_SIZE", "1024"))
+
+# One match per token: ignored characters (whitespace, commas, BOM, comments)
+# before it are consumed by the same match. Every position matches a token,
+# an error or the end of the text, so matching never backtracks.
+GRAPHQL_TOKEN = re.compile(r'''
+    (?:[\s,\ufeff]+|\#[^\n]*)*
+    (?:
+        (?P<spread>\.\.\.)
+      | (?P<punct>[!$&()\[\]{}:=@|])
+      | (?P<name>[_A-Za-z][_0-9A-Za-z]*)
+      | (?P<number>-?(?:0|[1-9][0-9]*)(?P<fraction>\.[0-9]+)?(?P<exponent>[eE][+-]?[0-9]+)?)
+      | (?P<block_string>"""(?:[^"\\]|\\.|"(?!""))*""")
+      | (?P<string>"(?:[^"\\\n]|\\.)*")
+      | (?P<error>.)
+      | (?P<end>\Z)
+    )
+''', re.VERBOSE)
+
+Operation = namedtuple("Operation", "type name fields variable_defaults signature")
+Field = namedtuple("Field", "name alias arguments selections")
+Variable = namedtuple("Variable", "name")
+
+
+class GraphQLSyntaxError(ValueError):
+    pass
+
+
+def tokenize_graphql(text):
+    """Split a GraphQL document into ``(kind, value)`` tokens in one pass"""
+    tokens = []
+    append = tokens.append
+    for m in GRAPHQL_TOKEN.finditer(text):
+        kind = m.lastgroup
+        if kind == 'number':
+            kind = 'float' if m.group('fraction') or m.group('exponent') else 'int'
+            append((kind, m.group('number')))
+        elif kind == 'error':
+            raise GraphQLSyntaxError(f"Unexpected character {m.group(kind)!r} at offset {m.start(kind)}")
+        elif kind == 'end':
+            break
+        else:
+            append((kind, m.group(kind)))
+    tokens.append(('eof', ''))
+    return tokens
+
+
+class GraphQLParser:
+    """Recursive-descent parser producing a normalized ``Operation``.
+
+    Fragment spreads are inlined, variables stay as ``Variable`` references
+    (see ``resolve_arguments``) and ``signature`` is a whitespace-independent
+    rendering of the operation.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize_graphql(text)
+        self.pos = 0
+        self.fragments = {}
+
+    def peek(self, kind, value=None):
+        tok_kind, tok_value = self.tokens[self.pos]
+        return tok_kind == kind and (value is None or tok_value == value)
+
+    def expect(self, kind, value=None):
+        if not self.peek(kind, value):
+            tok_kind, tok_value = self.tokens[self.pos]
+            expected = value or kind
+            raise GraphQLSyntaxError(f"Expected {expected}, found {tok_value or tok_kind}")
+        token = self.tokens[self.pos][1]
+        self.pos += 1
+        return token
+
+    def skip(self, kind, value=None):
+        if self.peek(kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def parse_document(self):
+        operations = []
+        while not self.peek('eof'):
+            if self.peek('name', 'fragment'):
+                self.parse_fragment_definition()
+            else:
+                operations.append(self.parse_operation_definition())
+        if not operations:
+            raise GraphQLSyntaxError("Document does not contain an operation")
+        op_type, name, variable_defaults, selections = operations[0]
+        fields = self.inline_fragments(selections, set())
+        # Only query results are cached by signature; mutations can carry
+        # thousands of inline inputs that would be rendered for nothing
+        signature = f"{op_type} {name or ''}{render_selections(fields)}" if op_type == 'query' else None
+        return Operation(op_type, name, fields, variable_defaults, signature)
+
+    def parse_operation_definition(self):
+        if self.peek('punct', '{'):
+            return 'query', None, {}, self.parse_selection_set()
+        op_type = self.expect('name')
+        if op_type not in ('query', 'mutation', 'subscription'):
+            raise GraphQLSyntaxError(f"Unexpected {op_type}")
+        name = self.expect('name') if self.peek('name') else None
+        variable_defaults = self.parse_variable_definitions()
+        self.parse_directives()
+        return op_type, name, variable_defaults, self.parse_selection_set()
+
+    def parse_fragment_definition(self):
+        self.expect('name', 'fragment')
+        name = self.expect('name')
+        self.expect('name', 'on')
+        self.expect('name')
+        self.parse_directives()
+        self.fragments[name] = self.parse_selection_set()
+
+    def parse_variable_definitions(self):
+        defaults = {}
+        if self.skip('punct', '('):
+            while not self.skip('punct', ')'):
+                self.expect('punct', '$')
+                name = self.expect('name')
+                self.expect('punct', ':')
+                self.parse_type()
+                if self.skip('punct', '='):
+                    defaults[name] = self.parse_value(const=True)
+                self.parse_directives()
+        return defaults
+
+    def parse_type(self):
+        if self.skip('punct', '['):
+            self.parse_type()
+            self.expect('punct', ']')
+        else:
+            self.expect('name')
+        self.skip('punct', '!')
+
+    def parse_directives(self):
+        while self.skip('punct', '@'):
+            self.expect('name')
+            self.parse_arguments()
+
+    def parse_selection_set(self):
+        self.expect('punct', '{')
+        selections = []
+        while not self.skip('punct', '}'):
+            if self.skip('spread'):
+                if self.peek('name') and not self.peek('name', 'on'):
+                    selections.append(('spread', self.expect('name')))
+                    self.parse_directives()
+                else:
+                    if self.skip('name', 'on'):
+                        self.expect('name')
+                    self.parse_directives()
+                    selections.append(('inline', self.parse_selection_set()))
+            else:
+                selections.append(('field', self.parse_field()))
+        return selections
+
+    def parse_field(self):
+        alias, name = None, self.expect('name')
+        if self.skip('punct', ':'):
+            alias, name = name, self.expect('name')
+        arguments = self.parse_arguments()
+        self.parse_directives()
+        selections = self.parse_selection_set() if self.peek('punct', '{') else []
+        return alias, name, arguments, selections
+
+    def parse_arguments(self):
+        arguments = {}
+        if self.skip('punct', '('):
+            while not self.skip('punct', ')'):
+                name = self.expect('name')
+                self.expect('punct', ':')
+                arguments[name] = self.parse_value()
+        return arguments
+
+    def parse_value(self, const=False):
+        tokens = self.tokens
+        kind, value = tokens[self.pos]
+        self.pos += 1
+        if kind == 'string':
+            # Escapes are rare; only strings that have them go through json
+            return value[1:-1] if '\\' not in value else json.loads(value)
+        if kind == 'int':
+            return int(value)
+        if kind == 'punct':
+            if value == '{':
+                fields = {}
+                while True:
+                    kind, value = tokens[self.pos]
+                    if kind == 'punct' and value == '}':
+                        self.pos += 1
+                        return fields
+                    if kind != 'name' or tokens[self.pos + 1] != ('punct', ':'):
+                        raise GraphQLSyntaxError(f"Expected object field, found {value or kind}")
+                    self.pos += 2
+                    fields[value] = self.parse_value(const)
+            if value == '[':
+                items = []
+                while not self.skip('punct', ']'):
+                    items.append(self.parse_value(const))
+                return items
+            if value == '$' and not const:
+                return Variable(self.expect('name'))
+        if kind == 'float':
+            return float(value)
+        if kind == 'block_string':
+            return value[3:-3].replace('\\"""', '"""')
+        if kind == 'name':
+            return {'true': True, 'false': False, 'null': None}.get(value, value)
+        raise GraphQLSyntaxError(f"Unexpected {value or kind}")
+
+    def inline_fragments(self, selections, seen):
+        fields = []
+        for kind, item in selections:
+            if kind == 'field':
+                alias, name, arguments, sub_selections = item
+                fields.append(Field(name, alias, arguments, self.inline_fragments(sub_selections, seen)))
+            elif kind == 'inline':
+                fields.extend(self.inline_fragments(item, seen))
+            else:
+                if item in seen or item not in self.fragments:
+                    raise GraphQLSyntaxError(f"Unknown or cyclic fragment {item}")
+                fields.extend(self.inline_fragments(self.fragments[item], seen | {item}))
+        return tuple(fields)
+
+
+def render_value(value):
+    if isinstance(value, Variable):
+        return f"${value.name}"
+    if isinstance(value, list):
+        return "[" + ",".join(render_value(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k}:{render_value(v)}" for k, v in value.items()) + "}"
+    return json.dumps(value)
+
+
+def render_selections(fields):
+    if not fields:
+        return ""
+    parts = []
+    for field in fields:
+        text = f"{field.alias}:{field.name}" if field.alias else field.name
+        if field.arguments:
+            text += "(" + ",".join(f"{k}:{render_value(v)}" for k, v in field.arguments.items()) + ")"
+        parts.append(text + render_selections(field.selections))
+    return "{" + " ".join(parts) + "}"
+
+
+@functools.lru_cache(maxsize=GRAPHQL_PARSE_CACHE_SIZE)
+def parse_graphql(query):
+    """Parse a GraphQL document into a normalized ``Operation`` (cached by text).
+
+    The result is shared between requests and must be treated as read-only.
+    """
+    return GraphQLParser(query).parse_document()
+
+
+def resolve_arguments(value, variables, defaults):
+    """Substitute ``Variable`` references in parsed argument values"""
+    if isinstance(value, Variable):
+        if variables and value.name in variables:
+            return variables[value.name]
+        return defaults.get(value.name)
+    if isinstance(value, list):
+        return [resolve_arguments(v, variables, defaults) for v in value]
+    if isinstance(value, dict):
+        return {k: resolve_arguments(v, variables, defaults) for k, v in value.items()}
+    return value
+
+
+def find_argument(arguments, name):
+    """Find an argument by name, also looking inside nested input objects"""
+    if name in arguments:
+        return arguments[name]
+    for value in arguments.values():
+        if isinstance(value, dict):
+            found = find_argument(value, name)
+            if found is not None:
+                return found
+    return None
+
+
+# Bumped by every mutation; cached responses from older generations are stale
+DATA_GENERATION = 0
+_generation_lock = threading.Lock()
+
+
+def bump_data_generation():
+    global DATA_GENERATION
+    with _generation_lock:
+        DATA_GENERATION += 1
+
+
+class ResponseCache:
+    """LRU cache of encoded GraphQL response bodies for read-only operations.
+
+    Entries remember the DATA_GENERATION they were built at and are ignored
+    once a mutation has moved the generation on.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, body):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (generation, body)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+RESPONSE_CACHE = ResponseCache(int(os.getenv("GRAPHQL_RESPONSE_CACHE_SIZE", "256")))
+
+# Results with more rows than this are streamed with chunked transfer
+# encoding instead of being encoded into one response body.
+GRAPHQL_STREAM_MIN_ROWS = int(os.getenv("GRAPHQL_STREAM_MIN_ROWS", "500"))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Most operations accepted in one array-batched GraphQL request
+GRAPHQL_MAX_BATCH = int(os.getenv("GRAPHQL_MAX_BATCH", "100"))
+
+
+def iter_json(value):
+    """Yield JSON text for ``value`` piece by piece (json.dumps formatting)"""
+    if isinstance(value, RowSelection):
+        yield "["
+        separator = ""
+        for row in value:
+            yield separator
+            yield json.dumps(row)
+            separator = ", "
+        yield "]"
+    elif isinstance(value, dict):
+        yield "{"
+        separator = ""
+        for key, item in value.items():
+            yield f"{separator}{json.dumps(key)}: "
+            yield from iter_json(item)
+            separator = ", "
+        yield "}"
+    else:
+        yield json.dumps(value, default=list)
+
+
+def iter_json_chunks(value):
+    """Encode ``value`` incrementally into ~STREAM_CHUNK_BYTES byte chunks"""
+    buffer, size = [], 0
+    for piece in iter_json(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+def encode_graphql_result(result):
+    """Encode a resolver result: bytes, or an iterator of chunks for large row selections"""
+    data = result.get("data") or {}
+    if any(isinstance(value, RowSelection) and len(value) > GRAPHQL_STREAM_MIN_ROWS for value in data.values()):
+        return iter_json_chunks(result)
+    return json.dumps(result, default=list).encode('utf-8')
+
+
+def execute_graphql(query, variables=None):
+    """Resolve a GraphQL request to its encoded JSON response body.
+
+    Large results come back as an iterator of chunks (see
+    encode_graphql_result). Other results of read-only operations are served
+    from RESPONSE_CACHE, keyed by the normalized operation and its variables,
+    until the next mutation.
+    """
+    started = time.perf_counter()
+    try:
+        operation = parse_graphql(query)
+    except GraphQLSyntaxError as e:
+        return json.dumps({"errors": [{"message": f"Syntax Error: {e}"}]}).encode('utf-8')
+    finally:
+        record_stage('parse', started)
+    if operation.fields:
+        REQUEST_STAGES.operation = operation.fields[0].name  # matched by fault rules
+
+    if operation.type != "query":
+        return resolve_and_encode(query, variables, operation)
+
+    key = (operation.signature, json.dumps(variables, sort_keys=True) if variables else "")
+    generation = DATA_GENERATION
+    body = RESPONSE_CACHE.get(key, generation)
+    if body is None:
+        body = resolve_and_encode(query, variables, operation)
+        if isinstance(body, bytes):
+            RESPONSE_CACHE.put(key, generation, body)
+    return body
+
+
+def resolve_and_encode(query, variables, operation):
+    """resolve_graphql_query + encode_graphql_result, timed as the "resolve"/"encode" stages"""
+    started = time.perf_counter()
+    result = resolve_graphql_query(query, variables, operation)
+    encode_started = time.perf_counter()
+    record_stage('resolve', started)
+    body = encode_graphql_result(result)
+    record_stage('encode', encode_started)
+    return body
+
+
+def execute_graphql_batch(requests):
+    """Resolve an array-batched GraphQL request to the JSON array of its responses.
+
+    Operations run in order, so later ones see earlier mutations. If any
+    response is streamed the array is streamed too.
+    """
+    bodies = []
+    for request in requests:
+        if isinstance(request, dict):
+            bodies.append(execute_graphql(request.get('query', ''), request.get('variables')))
+        else:
+            bodies.append(json.dumps({"errors": [{"message": "Batched operations must be objects"}]}).encode('utf-8'))
+    if all(isinstance(body, bytes) for body in bodies):
+        return b"[" + b",".join(bodies) + b"]"
+    return iter_batch_chunks(bodies)
+
+
+def iter_batch_chunks(bodies):
+    """Join encoded and streamed response bodies into one JSON array"""
+    pending = b"["
+    for index, body in enumerate(bodies):
+        if index:
+            pending += b","
+        if isinstance(body, bytes):
+            pending += body
+        else:
+            yield pending
+            pending = b""
+            yield from body
+    yield pending + b"]"
+
+
+def pagination_arguments(arguments):
+    """``first``/``after`` (cursor = id of the last row seen) and ``limit``/``offset`` paging"""
+    page = {}
+    after = find_argument(arguments, "after")
+    if after is not None:
+        page["after"] = str(after)
+    limit = find_argument(arguments, "first")
+    if limit is None:
+        limit = find_argument(arguments, "limit")
+    if limit is not None:
+        page["limit"] = max(0, paging_integer("first/limit", limit))
+    offset = find_argument(arguments, "offset")
+    if offset is not None:
+        page["offset"] = max(0, paging_integer("offset", offset))
+    return page
 
 
-def resolve_graphql_query(query, variables=None):
-    """Simple GraphQL query resolver"""
-    global POST_ID_COUNTER, VOUCHER_ID_COUNTER
+def paging_integer(name, value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}: {value!r}") from None
 
-    query = query.strip()
+
+def with_author(post):
+    post_with_author = post.copy()
+    post_with_author["author"] = USERS.get(post["authorId"])
+    return post_with_author
+
+
+# Required fields of a createTransferVouchers input, in the order
+# transfer_voucher_input returns them, with their conversion
+TRANSFER_VOUCHER_INPUT_FIELDS = (
+    ("shippingStoreCode", int),
+    ("arrivalStoreCode", int),
+    ("shippingDate", str),
+    ("planDeliveryDate", str),
+    ("shippingQuantity", int),  # quantities and prices may be sent as strings
+    ("shippingSellingPrice", int),
+    ("jan", str),
+)
+
+
+def transfer_voucher_input(item):
+    """Validate one createTransferVouchers input object into a tuple of its fields"""
+    if not isinstance(item, dict):
+        raise TypeError(f"inputs must be objects, got {item!r}")
+    try:
+        values = tuple(convert(item[name]) for name, convert in TRANSFER_VOUCHER_INPUT_FIELDS)
+    except KeyError as e:
+        raise ValueError(f"input is missing {e.args[0]}") from None
+    if values[4] <= 0:
+        raise ValueError(f"shippingQuantity must be positive, got {values[4]}")
+    return values
+
+
+def resolve_graphql_query(query, variables=None, operation=None):
+    """Simple GraphQL query resolver
+
+    ``operation`` may be passed in when the caller has already parsed ``query``.
+    """
+    if operation is None:
+        try:
+            operation = parse_graphql(query)
+        except GraphQLSyntaxError as e:
+            return {"errors": [{"message": f"Syntax Error: {e}"}]}
+
+    root = operation.fields[0] if operation.fields else None
+    if root is None:
+        return {"errors": [{"message": "Query not recognized"}]}
+    arguments = resolve_arguments(root.arguments, variables, operation.variable_defaults)
+    response_key = root.alias or root.name
 
     # Query: variousTransferVoucherPrints
-    if "variousTransferVoucherPrints" in query and "query" in query.lower():
-        # Extract query parameters
-        vouchers = list(TRANSFER_VOUCHERS.values())
+    if operation.type == "query" and root.name == "variousTransferVoucherPrints":
+        filters = {}
 
         # Filter by shippingStoreCode
-        shipping_store_match = re.search(r'shippingStoreCode:\s*(\d+)', query)
-        if shipping_store_match:
-            shipping_store_code = int(shipping_store_match.group(1))
-            vouchers = [v for v in vouchers if v["shippingStoreCode"] == shipping_store_code]
+        shipping_store_code = find_argument(arguments, "shippingStoreCode")
+        if shipping_store_code is not None:
+            filters["shippingStoreCode"] = int(shipping_store_code)
 
         # Filter by arrivalStoreCode
-        arrival_store_match = re.search(r'arrivalStoreCode:\s*(\d+)', query)
-        if arrival_store_match:
-            arrival_store_code = int(arrival_store_match.group(1))
-            vouchers = [v for v in vouchers if v["arrivalStoreCode"] == arrival_store_code]
+        arrival_store_code = find_argument(arguments, "arrivalStoreCode")
+        if arrival_store_code is not None:
+            filters["arrivalStoreCode"] = int(arrival_store_code)
 
         # Filter by shippingDate
-        shipping_date_match = re.search(r'shippingDate:\s*"([^"]+)"', query)
-        if shipping_date_match:
-            shipping_date = shipping_date_match.group(1)
-            vouchers = [v for v in vouchers if v["shippingDate"] == shipping_date]
+        shipping_date = find_argument(arguments, "shippingDate")
+        if shipping_date is not None:
+            filters["shippingDate"] = shipping_date
 
         # Filter by voucherType
-        voucher_type_match = re.search(r'voucherType:\s*(\d+)', query)
-        if voucher_type_match:
-            voucher_type = int(voucher_type_match.group(1))
-            vouchers = [v for v in vouchers if v["voucherType"] == voucher_type]
+        voucher_type = find_argument(arguments, "voucherType")
+        if voucher_type is not None:
+            filters["voucherType"] = int(voucher_type)
 
         # Filter by voucherIssuedFlag
-        voucher_issued_match = re.search(r'voucherIssuedFlag:\s*(true|false)', query, re.IGNORECASE)
-        if voucher_issued_match:
-            voucher_issued_flag = voucher_issued_match.group(1).lower() == "true"
-            vouchers = [v for v in vouchers if v["voucherIssuedFlag"] == voucher_issued_flag]
+        voucher_issued_flag = find_argument(arguments, "voucherIssuedFlag")
+        if voucher_issued_flag is not None:
+            filters["voucherIssuedFlag"] = str(voucher_issued_flag).lower() == "true"
 
-        return {"data": {"variousTransferVoucherPrints": vouchers}}
+        try:
+            vouchers = TRANSFER_VOUCHERS.select(**pagination_arguments(arguments), **filters)
+        except KeyError as e:
+            return {"errors": [{"message": f"Unknown cursor: {e.args[0]}"}]}
+        except ValueError as e:
+            return {"errors": [{"message": str(e)}]}
+        return {"data": {response_key: vouchers}}
 
     # Mutation: createTransferVouchers
-    if "createTransferVouchers" in query and "mutation" in query.lower():
-        # Extract input array from mutation
-        # This is a simplified parser - in production, use a proper GraphQL library
-        created_vouchers = []
+    if operation.type == "mutation" and root.name == "createTransferVouchers":
+        # inputs were parsed with the document (inline) or come from variables
+        inputs = find_argument(arguments, "inputs")
+        if isinstance(inputs, dict):
+            inputs = [inputs]  # GraphQL input coercion: a single object is a list of one
+        try:
+            vouchers = [transfer_voucher_input(item) for item in inputs or ()]
+        except (TypeError, ValueError) as e:
+            return {"errors": [{"message": f"createTransferVouchers: {e}"}]}
 
-        # Find all input objects in the mutation
-        input_pattern = r'\{[^}]*shippingStoreCode:\s*(\d+)[^}]*arrivalStoreCode:\s*(\d+)[^}]*shippingDate:\s*"([^"]+)"[^}]*planDeliveryDate:\s*"([^"]+)"[^}]*shippingQuantity:\s*"([^"]+)"[^}]*shippingSellingPrice:\s*"([^"]+)"[^}]*jan:\s*"([^"]+)"[^}]*\}'
-        matches = re.finditer(input_pattern, query)
-
-        for match in matches:
-            new_voucher = {
-                "id": str(VOUCHER_ID_COUNTER),
-                "shippingStoreCode": int(match.group(1)),
-                "shippingStoreName": "Test Store",
-                "arrivalStoreCode": int(match.group(2)),
-                "arrivalStoreName": "Destination Store",
-                "departmentCode": "D999",
-                "departmentName": "General",
-                "voucherType": 30,
-                "voucherTypeName": "Transfer Type A",
-                "voucherNo": f"V{VOUCHER_ID_COUNTER:03d}",
-                "voucherIssuedFlag": False,
-                "shippingDate": match.group(3),
-                "planDeliveryDate": match.group(4),
-                "actualDeliveryDate": None,
-                "printDate": datetime.now().strftime("%Y-%m-%d"),
-                "shippingRegistrationUnit": "Unit Auto",
-                "totalShippingQuantity": int(match.group(5)),
-                "totalShippingCostPrice": int(match.group(6)) * 0.6,  # 60% of selling price
-                "totalShippingSellingAmount": int(match.group(6)),
-                "totalArrivalSellingAmount": int(match.group(6)),
-                "totalVariousQuantity": 0,
-                "totalVariousCostPrice": 0,
-                "totalVariousShippingSellingAmount": 0,
-                "totalVariousArrivalSellingAmount": 0,
-                "transferVoucherItems": [
-                    {
-                        "voucherNo": f"V{VOUCHER_ID_COUNTER:03d}",
-                        "jan": match.group(7),
-                        "productName": f"Product {match.group(7)}",
-                        "shippingQuantity": int(match.group(5)),
-                        "shippingCostPrice": int(match.group(6)) * 0.6 / int(match.group(5)),
-                        "totalShippingCostPrice": int(match.group(6)) * 0.6,
-                        "shippingSellingPrice": int(match.group(6)) / int(match.group(5)),
-                        "arrivalSellingPrice": int(match.group(6)) / int(match.group(5)),
-                        "totalShippingSellingPrice": int(match.group(6)),
-                        "totalArrivalSellingPrice": int(match.group(6)),
-                        "confirmedFlag": False,
-                        "variousVoucherQuantity": 0,
-                        "variousVoucherCostPrice": 0,
-                        "variousTotalCostPrice": 0,
-                        "variousProductName": "",
-                        "variousTotalShippingSellingPrice": 0,
-                        "variousTotalArrivalSellingPrice": 0
-                    }
-                ],
-                "createdAt": datetime.now().isoformat() + "Z"
-            }
-            TRANSFER_VOUCHERS[str(VOUCHER_ID_COUNTER)] = new_voucher
+        print_date = datetime.now().strftime("%Y-%m-%d")
+        created_at = datetime.now().isoformat() + "Z"
+        records = [
+            (VOUCHER_IDS.allocate(), shipping_store, arrival_store, 30, False, shipping_date, plan_date,
+             quantity, price, jan, print_date, created_at)
+            for shipping_store, arrival_store, shipping_date, plan_date, quantity, price, jan in vouchers
+        ]
+        DATA_LOG.append("vouchers", records)
+        created_vouchers = []
+        for record in records:
+            new_voucher = transfer_voucher_row(record)
+            TRANSFER_VOUCHERS[new_voucher["id"]] = new_voucher
             created_vouchers.append(new_voucher)
-            VOUCHER_ID_COUNTER += 1
 
-        return {"data": {"createTransferVouchers": created_vouchers}}
+        if created_vouchers:
+            bump_data_generation()
+        return {"data": {response_key: created_vouchers}}
 
     # Query: posts
-    if "posts" in query and "query" in query.lower():
-        posts = list(POSTS.values())
+    if operation.type == "query" and root.name == "posts":
         # Add author info if requested
-        if "author" in query:
-            posts_with_authors = []
-            for post in posts:
-                post_with_author = post.copy()
-                post_with_author["author"] = USERS.get(post["authorId"])
-                posts_with_authors.append(post_with_author)
-            return {"data": {"posts": posts_with_authors}}
-        return {"data": {"posts": posts}}
+        transform = None
+        if any(field.name == "author" for field in root.selections):
+            transform = with_author
+        try:
+            posts = POSTS.select(transform=transform, **pagination_arguments(arguments))
+        except KeyError as e:
+            return {"errors": [{"message": f"Unknown cursor: {e.args[0]}"}]}
+        except ValueError as e:
+            return {"errors": [{"message": str(e)}]}
+        return {"data": {response_key: posts}}
 
     # Mutation: createPost
-    if "createPost" in query and "mutation" in query.lower():
-        title_match = re.search(r'title:\s*"([^"]+)"', query)
-        content_match = re.search(r'content:\s*"([^"]+)"', query)
-        author_id_match = re.search(r'authorId:\s*"(\d+)"', query)
-
-        if title_match and content_match and author_id_match:
-            title = title_match.group(1)
-            content = content_match.group(1)
-            author_id = author_id_match.group(1)
-
-            new_post = {
-                "id": str(POST_ID_COUNTER),
-                "title": title,
-                "content": content,
-                "authorId": author_id,
-                "createdAt": datetime.now().isoformat() + "Z"
-            }
-            POSTS[str(POST_ID_COUNTER)] = new_post
-            POST_ID_COUNTER += 1
+    if operation.type == "mutation" and root.name == "createPost":
+        title = arguments.get("title")
+        content = arguments.get("content")
+        author_id = arguments.get("authorId")
+
+        if title and content and author_id is not None:
+            author_id = str(author_id)
 
-            return {"data": {"createPost": new_post}}
+            record = (POST_IDS.allocate(), title, content, author_id, datetime.now().isoformat() + "Z")
+            DATA_LOG.append("posts", [record])
+            new_post = post_row(record)
+            POSTS[new_post["id"]] = new_post
+            bump_data_generation()
+
+            return {"data": {response_key: new_post}}
 
     return {"errors": [{"message": "Query not recognized"}]}
 
 
+# Server-side instrumentation, exposed on GET /metrics in the Prometheus
+# text format: per-route request counts and bytes written, plus latency
+# histograms of each request stage (whole request, body/GraphQL parsing,
+# resolving, encoding, writing the response).
+METRIC_ROUTES = ('/api/login', '/api/auth/login', '/api/graphql', '/login', '/graphql',
+                 '/stats', '/metrics', 'static', 'other')
+METRIC_STAGES = ('request', 'parse', 'resolve', 'encode', 'write')
+METRIC_STATUS_CLASSES = ('2xx', '3xx', '4xx', '5xx')
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Process CPU/RSS gauges are refreshed every this many requests (and on scrape)
+METRICS_PROCESS_INTERVAL = 256
+
+
+class ServerMetrics:
+    """Request counters and stage histograms kept in one flat float64 array.
+
+    Every series has a fixed offset, so recording a request is a handful of
+    additions under a per-process lock. In prefork mode ``share()`` moves
+    the values into anonymous shared memory with one slot per worker before
+    fork(); each worker only writes its own slot and /metrics, served by
+    any worker, sums all of them.
+    """
+    PROCESS_FIELDS = ('pid', 'cpu_seconds', 'rss_bytes')
+
+    def __init__(self):
+        self._route_index = {route: index for index, route in enumerate(METRIC_ROUTES)}
+        self._stage_index = {stage: index for index, stage in enumerate(METRIC_STAGES)}
+        routes = len(METRIC_ROUTES)
+        self._histogram_size = len(LATENCY_BUCKETS) + 3  # buckets, +Inf, sum, count
+        self._bytes_base = routes * len(METRIC_STATUS_CLASSES)
+        self._histogram_base = self._bytes_base + routes
+        self._process_base = self._histogram_base + routes * len(METRIC_STAGES) * self._histogram_size
+        self._slot_size = self._process_base + len(self.PROCESS_FIELDS)
+        self._slots = 1
+        self._base = 0
+        self._values = memoryview(bytearray(self._slot_size * 8)).cast('d')
+        self._lock = threading.Lock()
+        self._observed = 0
+
+    def share(self, workers):
+        """Move to shared memory with one slot per prefork worker (call before fork)"""
+        self._slots = workers
+        self._values = memoryview(mmap.mmap(-1, workers * self._slot_size * 8)).cast('d')
+
+    def use_slot(self, index):
+        """Record this process's requests into slot ``index`` (call in the worker)"""
+        self._base = index * self._slot_size
+        self._update_process()
+
+    def observe(self, route, status, timings, bytes_written):
+        """Record one request: ``timings`` maps stage names to seconds"""
+        values, base = self._values, self._base
+        route_index = self._route_index.get(route, len(METRIC_ROUTES) - 1)
+        status_index = min(max(status // 100 - 2, 0), len(METRIC_STATUS_CLASSES) - 1)
+        with self._lock:
+            values[base + route_index * len(METRIC_STATUS_CLASSES) + status_index] += 1
+            values[base + self._bytes_base + route_index] += bytes_written
+            for stage, seconds in timings.items():
+                offset = base + self._histogram_offset(route_index, self._stage_index[stage])
+                values[offset + bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                values[offset + len(LATENCY_BUCKETS) + 1] += seconds
+                values[offset + len(LATENCY_BUCKETS) + 2] += 1
+            self._observed += 1
+            if self._observed % METRICS_PROCESS_INTERVAL == 0:
+                self._update_process()
+
+    def _histogram_offset(self, route_index, stage_index):
+        return self._histogram_base + (route_index * len(METRIC_STAGES) + stage_index) * self._histogram_size
+
+    def _update_process(self):
+        times = os.times()
+        offset = self._base + self._process_base
+        self._values[offset:offset + 3] = memoryview(
+            array('d', (os.getpid(), times.user + times.system, current_rss_bytes())).tobytes()).cast('d')
+
+    def _total(self, offset):
+        return sum(self._values[slot * self._slot_size + offset] for slot in range(self._slots))
+
+    def render(self):
+        """All series in the Prometheus text exposition format"""
+        with self._lock:
+            self._update_process()
+        lines = [
+            "# HELP mock_requests_total Requests served by the mock, by route and status class.",
+            "# TYPE mock_requests_total counter",
+        ]
+        for route_index, route in enumerate(METRIC_ROUTES):
+            for status_index, status in enumerate(METRIC_STATUS_CLASSES):
+                count = self._total(route_index * len(METRIC_STATUS_CLASSES) + status_index)
+                if count:
+                    lines.append(f'mock_requests_total{{route="{route}",code="{status}"}} {count:.0f}')
+        lines += [
+            "# HELP mock_response_bytes_total Response bytes written, by route.",
+            "# TYPE mock_response_bytes_total counter",
+        ]
+        for route_index, route in enumerate(METRIC_ROUTES):
+            written = self._total(self._bytes_base + route_index)
+            if written:
+                lines.append(f'mock_response_bytes_total{{route="{route}"}} {written:.0f}')
+        lines += [
+            "# HELP mock_stage_duration_seconds Time spent in each stage of a request, by route.",
+            "# TYPE mock_stage_duration_seconds histogram",
+        ]
+        for route_index, route in enumerate(METRIC_ROUTES):
+            for stage_index, stage in enumerate(METRIC_STAGES):
+                offset = self._histogram_offset(route_index, stage_index)
+                count = self._total(offset + len(LATENCY_BUCKETS) + 2)
+                if not count:
+                    continue
+                labels = f'route="{route}",stage="{stage}"'
+                cumulative = 0
+                for bucket_index, bound in enumerate((*LATENCY_BUCKETS, "+Inf")):
+                    cumulative += self._total(offset + bucket_index)
+                    lines.append(f'mock_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative:.0f}')
+                lines.append(f'mock_stage_duration_seconds_sum{{{labels}}} {self._total(offset + len(LATENCY_BUCKETS) + 1):.6f}')
+                lines.append(f'mock_stage_duration_seconds_count{{{labels}}} {count:.0f}')
+        lines += [
+            "# HELP process_cpu_seconds_total User and system CPU time of each server process.",
+            "# TYPE process_cpu_seconds_total counter",
+        ]
+        processes = [self._values[slot * self._slot_size + self._process_base:][:3] for slot in range(self._slots)]
+        for worker, (pid, cpu, _) in enumerate(processes):
+            if pid:
+                lines.append(f'process_cpu_seconds_total{{worker="{worker}",pid="{pid:.0f}"}} {cpu:.3f}')
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory of each server process.",
+            "# TYPE process_resident_memory_bytes gauge",
+        ]
+        for worker, (pid, _, rss) in enumerate(processes):
+            if pid:
+                lines.append(f'process_resident_memory_bytes{{worker="{worker}",pid="{pid:.0f}"}} {rss:.0f}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = ServerMetrics()
+
+# Stage timings (and GraphQL operation) of the request being handled by the
+# current thread; None outside a request. The asyncio engine handles one
+# request at a time.
+REQUEST_STAGES = threading.local()
+
+
+def record_stage(stage, started):
+    """Add the time since ``started`` (a perf_counter() value) to the current request"""
+    timings = getattr(REQUEST_STAGES, 'timings', None)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def metric_route(method, path):
+    """Route label of a request for METRICS"""
+    if method == 'POST':
+        return path if path in POST_ROUTES else 'other'
+    if path in GET_ROUTES:
+        return path
+    return 'static' if method in ('GET', 'HEAD') else 'other'
+
+
+def parse_json_body(body):
+    """json.loads a request body, timed as the "parse" stage"""
+    started = time.perf_counter()
+    try:
+        return json.loads(body.decode('utf-8'))
+    finally:
+        record_stage('parse', started)
+
+
+# Built-in profiler, off unless PROFILE_MODE is set or it is switched on with
+# POST /admin/profile. "sample" records the stacks of all threads every
+# PROFILE_INTERVAL seconds as collapsed stacks (flamegraph.pl/speedscope
+# input); "cprofile" runs cProfile on one request in PROFILE_EVERY. Dumps
+# are written every PROFILE_DUMP_INTERVAL seconds and when profiling stops.
+PROFILE_MODES = ('off', 'sample', 'cprofile')
+PROFILE_MODE = os.getenv("PROFILE_MODE", "off")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+PROFILE_EVERY = int(os.getenv("PROFILE_EVERY", "100"))
+PROFILE_DUMP_INTERVAL = float(os.getenv("PROFILE_DUMP_INTERVAL", "10"))
+# Relative paths resolve against locust/ (the default is locust/logs)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "logs")
+# Leaf frames of threads waiting for I/O; samples ending in them are idle time
+IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('socket.py', 'readinto'),
+    ('socket.py', 'accept'),
+    ('threading.py', 'wait'),
+}
+
+
+class Profiler:
+    """Sampling / 1-in-N cProfile profiler of this server process.
+
+    Output files are per process (prefork workers profile separately):
+      server_profile_<pid>.collapsed   "frame;frame;... count" per stack
+      server_profile_<pid>.pstats      cProfile stats (python -m pstats)
+      server_profile_<pid>.txt         top functions by cumulative time
+    """
+
+    def __init__(self):
+        self.mode = 'off'
+        self.directory = None
+        self.stacks = {}
+        self.samples = 0
+        self.idle_samples = 0
+        self.stats = None
+        self.profiled = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, mode, interval=PROFILE_INTERVAL, every=PROFILE_EVERY, directory=PROFILE_DIR):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (use one of {', '.join(PROFILE_MODES)})")
+        if interval <= 0 or every < 1:
+            raise ValueError("interval must be positive and every at least 1")
+        self.stop()
+        if mode == 'off':
+            return
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), directory)
+        self.directory = directory
+        self.interval = interval
+        self.every = every
+        self.stacks = {}
+        self.samples = 0
+        self.idle_samples = 0
+        self.stats = None
+        self.profiled = 0
+        self._requests = itertools.count()
+        self._profiling = threading.Lock()
+        self._stop.clear()
+        self.mode = mode
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop profiling and write the final dump; returns the files written"""
+        if self.mode == 'off':
+            return []
+        self.mode = 'off'
+        self._stop.set()
+        self._thread.join()
+        return self.dump()
+
+    def _run(self):
+        last_dump = time.monotonic()
+        wait = self.interval if self.mode == 'sample' else PROFILE_DUMP_INTERVAL
+        while not self._stop.wait(wait):
+            if self.mode == 'sample':
+                self._sample()
+            if time.monotonic() - last_dump >= PROFILE_DUMP_INTERVAL:
+                self.dump()
+                last_dump = time.monotonic()
+
+    def _sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                self.idle_samples += 1
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            stack = ';'.join(reversed(names))
+            with self._lock:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def request(self):
+        """Context manager around a request: profiles one in ``every`` in cprofile mode"""
+        if self.mode != 'cprofile' or next(self._requests) % self.every:
+            return NO_PROFILE
+        return self._profile_request()
+
+    @contextlib.contextmanager
+    def _profile_request(self):
+        # Only one cProfile can be active per process (sys.monitoring in 3.12)
+        if not self._profiling.acquire(blocking=False):
+            yield
+            return
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+            with self._lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+                self.profiled += 1
+        finally:
+            self._profiling.release()
+
+    def dump(self):
+        """Write the data collected so far; returns the files written"""
+        prefix = os.path.join(self.directory, f"server_profile_{os.getpid()}")
+        written = []
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._lock:
+                if self.stacks:
+                    with open(prefix + '.collapsed', 'w') as f:
+                        f.writelines(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+                    written.append(prefix + '.collapsed')
+                if self.stats is not None:
+                    self.stats.dump_stats(prefix + '.pstats')
+                    with open(prefix + '.txt', 'w') as f:
+                        f.write(f"{self.profiled} profiled request(s), 1 in {self.every}\n")
+                        self.stats.stream = f
+                        self.stats.sort_stats('cumulative').print_stats(40)
+                    written += [prefix + '.pstats', prefix + '.txt']
+        except OSError as e:
+            print(f"Failed to write profile to {self.directory}: {e}", flush=True)
+        return written
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "mode": self.mode,
+            "directory": self.directory,
+            "samples": self.samples,
+            "idleSamples": self.idle_samples,
+            "profiledRequests": self.profiled,
+        }
+
+
+NO_PROFILE = contextlib.nullcontext()
+PROFILER = Profiler()
+
+
+# Fault injection: makes the mock behave like a slow or flaky downstream.
+# Rules (FAULTS_FILE, or POST /admin/faults at runtime) match a route and
+# optionally the root field of a GraphQL operation, and add latency drawn
+# from a distribution, error responses, connection resets or a trickled
+# response body. Delays never hold a server thread (see FaultLoop) and are
+# left out of /metrics, which keeps measuring the mock's own work.
+FAULTS_FILE = os.getenv("FAULTS_FILE", "")
+# Never faulted, so rules can always be inspected and switched off
+FAULT_EXEMPT_PATHS = ('/stats', '/metrics', '/admin/profile', '/admin/faults')
+
+FaultRule = namedtuple("FaultRule", "name route operation probability latency error_rate error_status "
+                                    "reset_rate trickle_rate trickle")
+# What to do to one response: seconds to wait, status to answer with instead
+# (or None), reset the connection, or (bytes per second, chunk bytes) to trickle
+Fault = namedtuple("Fault", "delay status reset trickle")
+
+
+def latency_sampler(spec):
+    """Function of a ``random.Random`` drawing one delay in seconds from a rule's "latency" spec"""
+    distribution = spec.get("distribution", "fixed")
+    cap = float(spec.get("max", math.inf))
+    if distribution == "fixed":
+        seconds = float(spec["seconds"])
+        return lambda rng: min(seconds, cap)
+    if distribution == "normal":
+        mean, stddev = float(spec["mean"]), float(spec.get("stddev", 0))
+        return lambda rng: min(max(0.0, rng.gauss(mean, stddev)), cap)
+    if distribution == "pareto":
+        # Long tail: at least ``scale``, P(delay > x) = (scale / x) ** shape
+        scale, shape = float(spec["scale"]), float(spec.get("shape", 1.5))
+        return lambda rng: min(scale * rng.paretovariate(shape), cap)
+    raise ValueError(f"unknown latency distribution {distribution!r} (use fixed, normal or pareto)")
+
+
+def parse_fault_rules(config):
+    """Validate ``{"seed": n, "rules": [...]}`` into a list of FaultRule"""
+    rules = []
+    for index, spec in enumerate(config.get("rules", ())):
+        name = spec.get("name", f"rule-{index}")
+        try:
+            trickle = spec.get("trickle")
+            rule = FaultRule(
+                name=name,
+                route=spec.get("route", "*"),
+                operation=spec.get("operation"),
+                probability=float(spec.get("probability", 1)),
+                latency=latency_sampler(spec["latency"]) if spec.get("latency") else None,
+                error_rate=float(spec.get("errorRate", 0)),
+                error_status=int(spec.get("errorStatus", 503)),
+                reset_rate=float(spec.get("resetRate", 0)),
+                trickle_rate=float(trickle.get("rate", 1)) if trickle else 0.0,
+                trickle=(float(trickle["bytesPerSecond"]), int(trickle.get("chunkBytes", 1024))) if trickle else None,
+            )
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"fault rule {name!r}: {e!r}") from None
+        if not 100 <= rule.error_status <= 599:
+            raise ValueError(f"fault rule {name!r}: errorStatus must be an HTTP status, got {rule.error_status}")
+        if rule.trickle and (rule.trickle[0] <= 0 or rule.trickle[1] <= 0):
+            raise ValueError(f"fault rule {name!r}: trickle bytesPerSecond and chunkBytes must be positive")
+        rules.append(rule)
+    return rules
+
+
+def load_fault_rules(path):
+    """Read a fault rules file (relative paths resolve against locust/)"""
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FaultInjector:
+    """Decides the fault of each response from the first rule matching it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configure({})
+
+    def configure(self, config):
+        """Replace the rules; raises ValueError (keeping the old rules) if ``config`` is invalid"""
+        rules = parse_fault_rules(config)
+        with self._lock:
+            self.config = config
+            self.rng = random.Random(config.get("seed"))
+            self.counts = {rule.name: dict.fromkeys(
+                ("matched", "delayed", "delaySeconds", "errors", "resets", "trickled"), 0) for rule in rules}
+            self.rules = rules
+
+    def pick(self, path, operation):
+        """Fault for a request to ``path`` running GraphQL ``operation`` (root field name), or None"""
+        rules = self.rules
+        if not rules or path in FAULT_EXEMPT_PATHS:
+            return None
+        path = path.partition('?')[0]
+        for rule in rules:
+            if rule.route not in ('*', path) or rule.operation not in (None, operation):
+                continue
+            with self._lock:
+                rng, counts = self.rng, self.counts[rule.name]
+                if rng.random() >= rule.probability:
+                    return None
+                counts["matched"] += 1
+                if rng.random() < rule.reset_rate:
+                    counts["resets"] += 1
+                    return Fault(0.0, None, True, None)
+                status = rule.error_status if rng.random() < rule.error_rate else None
+                delay = rule.latency(rng) if rule.latency else 0.0
+                trickle = rule.trickle if rng.random() < rule.trickle_rate else None
+                counts["errors"] += status is not None
+                counts["delayed"] += delay > 0
+                counts["delaySeconds"] += delay
+                counts["trickled"] += trickle is not None
+            if status is None and not delay and trickle is None:
+                return None
+            return Fault(delay, status, False, trickle)
+        return None
+
+    def status(self):
+        with self._lock:
+            counts = {name: {**values, "delaySeconds": round(values["delaySeconds"], 3)}
+                      for name, values in self.counts.items()}
+            return {"pid": os.getpid(), "config": self.config, "counts": counts}
+
+
+FAULTS = FaultInjector()
+
+
+def current_operation():
+    """Root field of the GraphQL operation the current request ran, if any"""
+    return getattr(REQUEST_STAGES, 'operation', None)
+
+
+def fault_error_response(status):
+    return json_response(status, {'errors': [{'message': f'Injected fault: HTTP {status}'}]})
+
+
+def json_response(status, payload, headers=()):
+    """Build a ``(status, headers, body)`` response with a JSON body"""
+    return status, [('Content-type', 'application/json'), *headers], json.dumps(payload).encode('utf-8')
+
+
+def handle_employee_login(body):
+    """POST /api/login, /api/auth/login - employee authentication"""
+    try:
+        data = parse_json_body(body)
+    except json.JSONDecodeError:
+        return json_response(400, {'status': 'error', 'message': 'Invalid JSON'})
+
+    employee_code = data.get('employeeCode')
+
+    # Simple validation - accept any employee code
+    if not employee_code:
+        return json_response(401, {'status': 'error', 'message': 'Employee code required'})
+
+    # Generate a simple token (in production, use proper JWT)
+    token = f"token_{employee_code}_{datetime.now().timestamp()}"
+    AUTH_TOKENS[token] = {
+        "employeeCode": employee_code,
+        "createdAt": datetime.now().isoformat()
+    }
+    response = {'status': 'success', 'message': 'Login successful', 'employeeCode': employee_code}
+    return json_response(200, response, [('X-Auth-New-Token', token)])
+
+
+def handle_graphql(body):
+    """Execute a ``{"query": ..., "variables": ...}`` GraphQL request body, or an array of them"""
+    try:
+        data = parse_json_body(body)
+        if isinstance(data, list):
+            if len(data) > GRAPHQL_MAX_BATCH:
+                return json_response(400, {'errors': [{'message': f'Batch exceeds {GRAPHQL_MAX_BATCH} operations'}]})
+            return 200, [('Content-type', 'application/json')], execute_graphql_batch(data)
+        query = data.get('query', '')
+        variables = data.get('variables')
+
+        # Execute GraphQL query
+        return 200, [('Content-type', 'application/json')], execute_graphql(query, variables)
+    except json.JSONDecodeError:
+        return json_response(400, {'errors': [{'message': 'Invalid JSON'}]})
+    except Exception as e:
+        return json_response(500, {'errors': [{'message': str(e)}]})
+
+
+def handle_api_graphql(headers, body):
+    """POST /api/graphql - GraphQL API with auth (transfer vouchers)"""
+    # Check for auth token (support both header names)
+    auth_token = headers.get('X-Auth-Token') or headers.get('X-Auth-New-Token', '')
+    if not auth_token or auth_token not in AUTH_TOKENS:
+        return json_response(401, {'errors': [{'message': 'Unauthorized - invalid or missing auth token'}]})
+    return handle_graphql(body)
+
+
+def handle_basic_login(body):
+    """POST /login - basic login"""
+    try:
+        data = parse_json_body(body)
+    except json.JSONDecodeError:
+        return json_response(400, {'status': 'error', 'message': 'Invalid JSON'})
+
+    username = data.get('username')
+    password = data.get('password')
+
+    if username == 'admin' and password == 'password':
+        return json_response(200, {'status': 'success', 'message': 'Login successful'})
+    return json_response(401, {'status': 'error', 'message': 'Invalid credentials'})
+
+
+def handle_stats():
+    """GET /stats - counters for this server process"""
+    cache = parse_graphql.cache_info()
+    return json_response(200, {
+        "pid": os.getpid(),
+        "graphqlParseCache": {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "size": cache.currsize,
+            "maxsize": cache.maxsize,
+        },
+        "authTokens": AUTH_TOKENS.stats(),
+        "stores": {
+            "users": len(USERS),
+            "posts": len(POSTS),
+            "transferVouchers": len(TRANSFER_VOUCHERS),
+        },
+        "staticFiles": STATIC_FILES.stats(),
+        "dataLog": DATA_LOG.stats(),
+        "graphqlResponseCache": {
+            "hits": RESPONSE_CACHE.hits,
+            "misses": RESPONSE_CACHE.misses,
+            "size": len(RESPONSE_CACHE),
+            "maxsize": RESPONSE_CACHE.maxsize,
+            "generation": DATA_GENERATION,
+        },
+    })
+
+
+def handle_profile_status():
+    """GET /admin/profile - profiler state of this server process"""
+    return json_response(200, PROFILER.status())
+
+
+def handle_profile(body):
+    """POST /admin/profile - {"mode": "sample"|"cprofile"|"off", "interval": s, "every": n}
+
+    Switching modes (or to "off") writes the profile collected so far. In
+    prefork mode this only reaches the worker that accepted the connection;
+    use PROFILE_MODE to profile every worker.
+    """
+    try:
+        data = parse_json_body(body)
+        written = PROFILER.stop()
+        PROFILER.start(data.get('mode', 'sample'),
+                       float(data.get('interval', PROFILE_INTERVAL)),
+                       int(data.get('every', PROFILE_EVERY)))
+    except (ValueError, TypeError, AttributeError) as e:
+        return json_response(400, {'status': 'error', 'message': str(e)})
+    return json_response(200, {**PROFILER.status(), "written": written})
+
+
+def handle_faults_status():
+    """GET /admin/faults - fault rules of this server process and what they injected"""
+    return json_response(200, FAULTS.status())
+
+
+def handle_faults(body):
+    """POST /admin/faults - replace the fault rules ({"rules": []} turns injection off)
+
+    Like /admin/profile, in prefork mode this only reaches the worker that
+    accepted the connection; use FAULTS_FILE to configure every worker.
+    """
+    try:
+        FAULTS.configure(parse_json_body(body))
+    except (ValueError, TypeError, AttributeError) as e:
+        return json_response(400, {'status': 'error', 'message': str(e)})
+    return json_response(200, FAULTS.status())
+
+
+def handle_metrics():
+    """GET /metrics - server instrumentation in the Prometheus text format"""
+    return 200, [('Content-type', 'text/plain; version=0.0.4; charset=utf-8')], METRICS.render().encode('utf-8')
+
+
+# GET routes served before falling back to static files
+GET_ROUTES = {
+    '/stats': handle_stats,
+    '/metrics': handle_metrics,
+    '/admin/profile': handle_profile_status,
+    '/admin/faults': handle_faults_status,
+}
+
+POST_ROUTES = {
+    '/api/login': lambda headers, body: handle_employee_login(body),
+    '/api/auth/login': lambda headers, body: handle_employee_login(body),
+    '/api/graphql': handle_api_graphql,
+    '/login': lambda headers, body: handle_basic_login(body),
+    '/graphql': lambda headers, body: handle_graphql(body),
+    '/admin/profile': lambda headers, body: handle_profile(body),
+    '/admin/faults': lambda headers, body: handle_faults(body),
+}
+
+
+def handle_post(path, headers, body):
+    """Route a POST request to the mock API.
+
+    Shared by both serving engines: ``headers`` only needs ``get()`` and the
+    result is a ``(status, headers, body)`` tuple for the engine to write.
+    """
+    route = POST_ROUTES.get(path)
+    if route is None:
+        return 404, [], b''
+    return route(headers, body)
+
+
 class RequestHandler(http.server.SimpleHTTPRequestHandler):
+    # Every response carries Content-Length or chunked encoding, so
+    # connections can be kept alive
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DOCUMENT_ROOT, **kwargs)
     
-    def guess_type(self, path):
-        mimetype = super().guess_type(path)
-        if mimetype and mimetype.startswith('text/'):
-            return mimetype + '; charset=utf-8'
-        return mimetype
-    
+    def do_GET(self):
+        self.observe_request(self.serve_get)
+
+    def do_HEAD(self):
+        self.observe_request(self.serve_static)
+
     def do_POST(self):
-        if self.path == '/api/login' or self.path == '/api/auth/login':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+        self.observe_request(self.serve_post)
 
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                employee_code = data.get('employeeCode')
-
-                # Simple validation - accept any employee code
-                if employee_code:
-                    # Generate a simple token (in production, use proper JWT)
-                    token = f"token_{employee_code}_{datetime.now().timestamp()}"
-                    AUTH_TOKENS[token] = {
-                        "employeeCode": employee_code,
-                        "createdAt": datetime.now().isoformat()
-                    }
-
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('X-Auth-New-Token', token)
-                    self.end_headers()
-                    response = {'status': 'success', 'message': 'Login successful', 'employeeCode': employee_code}
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-                else:
-                    self.send_response(401)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    response = {'status': 'error', 'message': 'Employee code required'}
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'status': 'error', 'message': 'Invalid JSON'}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-
-        elif self.path == '/api/graphql':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+    def serve_get(self):
+        route = GET_ROUTES.get(self.path)
+        if route is None:
+            return self.serve_static()
+        self.send_mock_response(*route())
 
-            try:
-                # Check for auth token (support both header names)
-                auth_token = self.headers.get('X-Auth-Token') or self.headers.get('X-Auth-New-Token', '')
-                if not auth_token or auth_token not in AUTH_TOKENS:
-                    self.send_response(401)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    response = {'errors': [{'message': 'Unauthorized - invalid or missing auth token'}]}
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-                    return
-
-                data = json.loads(post_data.decode('utf-8'))
-                query = data.get('query', '')
-                variables = data.get('variables')
-
-                # Execute GraphQL query
-                result = resolve_graphql_query(query, variables)
-
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(result).encode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'errors': [{'message': 'Invalid JSON'}]}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-            except Exception as e:
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'errors': [{'message': str(e)}]}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+    def serve_static(self):
+        self.send_mock_response(*serve_static(self.path, self.headers))
 
-        elif self.path == '/login':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+    def serve_post(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        post_data = self.rfile.read(content_length)
+        self.send_mock_response(*handle_post(self.path, self.headers, post_data))
 
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                username = data.get('username')
-                password = data.get('password')
-
-                if username == 'admin' and password == 'password':
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    response = {'status': 'success', 'message': 'Login successful'}
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-                else:
-                    self.send_response(401)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    response = {'status': 'error', 'message': 'Invalid credentials'}
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'status': 'error', 'message': 'Invalid JSON'}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-
-        elif self.path == '/graphql':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
+    def observe_request(self, serve):
+        """Run ``serve`` and record its status, bytes and stage timings in METRICS"""
+        started = time.perf_counter()
+        timings = REQUEST_STAGES.timings = {}
+        REQUEST_STAGES.operation = None
+        self.response_status = 500
+        self.bytes_written = 0
+        try:
+            with PROFILER.request():
+                serve()
+        finally:
+            REQUEST_STAGES.timings = None
+            timings['request'] = time.perf_counter() - started
+            METRICS.observe(metric_route(self.command, self.path), self.response_status, timings,
+                            self.bytes_written)
 
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-                query = data.get('query', '')
-                variables = data.get('variables')
-
-                # Execute GraphQL query
-                result = resolve_graphql_query(query, variables)
-
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(result).encode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'errors': [{'message': 'Invalid JSON'}]}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-            except Exception as e:
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                response = {'errors': [{'message': str(e)}]}
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
+    def send_mock_response(self, status, headers, body):
+        fault = FAULTS.pick(self.path, current_operation())
+        if fault is not None:
+            if fault.reset:
+                return self.reset_connection(status)
+            if fault.status is not None:
+                status, headers, body = fault_error_response(fault.status)
+            if fault.delay or fault.trickle:
+                return self.send_delayed_response(fault, status, headers, body)
+        started = time.perf_counter()
+        try:
+            self.write_mock_response(status, headers, body)
+        finally:
+            record_stage('write', started)
+
+    def reset_connection(self, status):
+        """Drop the connection with a TCP RST instead of responding"""
+        self.response_status = status
+        self.close_connection = True
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        self.server.detach(self.connection, None)
 
+    def send_delayed_response(self, fault, status, headers, body):
+        """Hand the connection and the rendered response to FAULT_LOOP and return this thread"""
+        data, keep_alive = render_response(status, headers, body, not self.close_connection,
+                                           self.request_version == 'HTTP/1.1', self.command == 'HEAD')
+        self.log_request(status)
+        self.response_status = status
+        self.bytes_written = len(data)
+        self.close_connection = True
+        self.server.detach(self.connection, deliver_detached(
+            self.server, self.connection, self.client_address, fault, data, keep_alive))
+
+    def write_mock_response(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if isinstance(body, bytes):
+            self.send_header('Content-Length', str(len(body)))
+        elif isinstance(body, SendFile):
+            self.send_header('Content-Length', str(body.size))
+        elif self.request_version == 'HTTP/1.1':
+            # Streamed body: chunked for HTTP/1.1 clients, close-delimited otherwise
+            self.send_header('Transfer-Encoding', 'chunked')
         else:
-            self.send_response(404)
-            self.end_headers()
+            self.close_connection = True
+        # Explicit, like the asyncio engine, so HTTP/1.0 clients keep the connection too
+        self.send_header('Connection', 'close' if self.close_connection else 'keep-alive')
+        self.end_headers()
+
+        if isinstance(body, SendFile):
+            with body.file:
+                if self.command != 'HEAD':
+                    self.bytes_written += self.connection.sendfile(body.file, 0, body.size)
+            return
+        if self.command == 'HEAD':
+            return
+        if isinstance(body, bytes):
+            self.wfile.write(body)
+            self.bytes_written += len(body)
+            return
+        chunked = self.request_version == 'HTTP/1.1'
+        for chunk in body:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+            self.bytes_written += len(chunk)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
 
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     """Multi-threaded TCP server for handling concurrent connections"""
@@ -519,19 +2717,627 @@ class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     # Daemon threads (they will terminate when the main program exits)
     daemon_threads = True
 
-if __name__ == "__main__":
-    with ThreadedTCPServer(("", PORT), RequestHandler) as httpd:
-        print(f"Serving HTTP on port {PORT}")
-        print(f"Document root: {os.path.abspath(DOCUMENT_ROOT)}")
-        print(f"Access at: http://localhost:{PORT}")
-        print(f"Multi-threaded server ready for high concurrency (queue size: {httpd.request_queue_size})")
-        print("Endpoints:")
-        print("  - /api/auth/login (POST) - Employee authentication")
-        print("  - /api/graphql (POST) - GraphQL API with auth (transfer vouchers)")
-        print("  - /login (POST) - Basic login")
-        print("  - /graphql (POST) - GraphQL API (posts)")
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.detached = {}
+
+    def detach(self, request, delivery):
+        """Keep ``request`` open when its handler returns and run ``delivery`` on FAULT_LOOP
+
+        A ``None`` delivery closes the socket without shutting it down first,
+        which resets the connection if SO_LINGER is zero.
+        """
+        self.detached[request] = delivery
+
+    def shutdown_request(self, request):
+        if request not in self.detached:
+            return super().shutdown_request(request)
+        delivery = self.detached.pop(request)
+        if delivery is None:
+            self.close_request(request)
+        else:
+            FAULT_LOOP.submit(delivery)
+
+
+# Event-loop engine: serves the same routes as RequestHandler from a single
+# thread, keeping HTTP/1.1 connections alive between requests.
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def translate_static_path(path):
+    """Map a URL path onto DOCUMENT_ROOT (same rules as SimpleHTTPRequestHandler)"""
+    path = path.split('?', 1)[0].split('#', 1)[0]
+    trailing_slash = path.rstrip().endswith('/')
+    path = posixpath.normpath(urllib.parse.unquote(path))
+    local_path = DOCUMENT_ROOT
+    for word in filter(None, path.split('/')):
+        if os.path.dirname(word) or word in (os.curdir, os.pardir):
+            continue
+        local_path = os.path.join(local_path, word)
+    if trailing_slash:
+        local_path += '/'
+    return local_path
+
+
+# Static files are served from memory: files smaller than
+# STATIC_SENDFILE_MIN_BYTES are read once, along with a gzip copy when that
+# is smaller, and larger ones are sent from disk with sendfile(). A cached
+# file is re-stat'ed at most every STATIC_REVALIDATE_INTERVAL seconds and
+# reloaded when its mtime or size changed.
+STATIC_CACHE_MAX_BYTES = int(os.getenv("STATIC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+STATIC_SENDFILE_MIN_BYTES = int(os.getenv("STATIC_SENDFILE_MIN_BYTES", str(256 * 1024)))
+STATIC_REVALIDATE_INTERVAL = float(os.getenv("STATIC_REVALIDATE_INTERVAL", "1"))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "60"))
+STATIC_GZIP_MIN_BYTES = 256
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+StaticFile = namedtuple('StaticFile', 'path size mtime_ns etag gzip_etag headers body gzip_body')
+
+
+class SendFile:
+    """Response body sent straight from an open file with sendfile()"""
+    __slots__ = ('file', 'size')
+
+    def __init__(self, file, size):
+        self.file = file
+        self.size = size
+
+    @classmethod
+    def from_path(cls, path):
+        """Open ``path`` for sending; the engine closes the file once it is sent"""
+        f = open(path, 'rb')  # noqa: SIM115 - ownership passes to the engine with the SendFile
+        try:
+            return cls(f, os.fstat(f.fileno()).st_size)
+        except BaseException:
+            f.close()
+            raise
+
+
+class StaticFileCache:
+    """LRU cache of DOCUMENT_ROOT files keyed by URL path, invalidated by mtime.
+
+    Only the bodies of in-memory files count against ``maxbytes``; entries
+    of sendfile()-served files just keep their headers.
+    """
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # URL path -> [StaticFile, last stat time]
+        self._lock = threading.Lock()
+
+    def get(self, url_path):
+        """The StaticFile served at ``url_path``, or None if there is none"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(url_path)
+            if cached is not None:
+                self._entries.move_to_end(url_path)
+        if cached is not None:
+            entry, checked = cached
+            if now - checked < STATIC_REVALIDATE_INTERVAL:
+                self.hits += 1
+                return entry
+            try:
+                st = os.stat(entry.path)
+            except OSError:
+                st = None
+            if st is not None and (st.st_mtime_ns, st.st_size) == (entry.mtime_ns, entry.size):
+                cached[1] = now
+                self.hits += 1
+                return entry
+            self._remove(url_path)
+
+        self.misses += 1
+        local_path = translate_static_path(url_path)
+        if os.path.isdir(local_path):
+            if not url_path.endswith('/'):
+                return None
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(local_path, index)):
+                    local_path = os.path.join(local_path, index)
+                    break
+            else:
+                return None
+        try:
+            entry = load_static_file(local_path)
+        except OSError:
+            return None
+        self._add(url_path, entry, now)
+        return entry
+
+    def _add(self, url_path, entry, now):
+        size = len(entry.body or b'') + len(entry.gzip_body or b'')
+        if size > self.maxbytes:
+            return
+        with self._lock:
+            self._remove_locked(url_path)
+            self._entries[url_path] = [entry, now]
+            self.bytes += size
+            while self.bytes > self.maxbytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted.body or b'') + len(evicted.gzip_body or b'')
+
+    def _remove(self, url_path):
+        with self._lock:
+            self._remove_locked(url_path)
+
+    def _remove_locked(self, url_path):
+        cached = self._entries.pop(url_path, None)
+        if cached is not None:
+            self.bytes -= len(cached[0].body or b'') + len(cached[0].gzip_body or b'')
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "files": len(self._entries),
+                "bytes": self.bytes, "maxBytes": self.maxbytes}
+
+
+STATIC_FILES = StaticFileCache(STATIC_CACHE_MAX_BYTES)
+
+
+def load_static_file(local_path):
+    """Read a file's headers (and body, unless it is sent with sendfile()) into a StaticFile"""
+    with open(local_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        body = f.read() if st.st_size < STATIC_SENDFILE_MIN_BYTES else None
+
+    mimetype = mimetypes.guess_type(local_path)[0] or 'application/octet-stream'
+    compressible = mimetype.startswith(COMPRESSIBLE_TYPES)
+    if mimetype.startswith('text/'):
+        mimetype += '; charset=utf-8'
+    gzip_body = None
+    if body is not None and compressible and len(body) >= STATIC_GZIP_MIN_BYTES:
+        gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(gzip_body) >= len(body):
+            gzip_body = None
+
+    headers = [
+        ('Content-type', mimetype),
+        ('Last-Modified', email.utils.formatdate(st.st_mtime, usegmt=True)),
+        ('Cache-Control', f'public, max-age={STATIC_MAX_AGE}'),
+    ]
+    if gzip_body is not None:
+        headers.append(('Vary', 'Accept-Encoding'))
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    return StaticFile(local_path, st.st_size, st.st_mtime_ns, etag, etag[:-1] + '-gz"',
+                      headers, body, gzip_body)
+
+
+def accepts_gzip(accept_encoding):
+    """True if an Accept-Encoding header value allows gzip"""
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            quality = params.strip()
+            return not (quality.startswith('q=') and float(quality[2:] or 0) == 0)
+    return False
+
+
+def not_modified(entry, etag, request_headers):
+    """Evaluate If-None-Match (or, without it, If-Modified-Since) for a StaticFile"""
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = request_headers.get('If-Modified-Since')
+    if if_modified_since is not None:
         try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nShutting down server...")
-            httpd.shutdown()
\ No newline at end of file
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and entry.mtime_ns // 10**9 <= since.timestamp()
+    return False
+
+
+def render_directory_listing(url_path, local_path):
+    """HTML listing of a directory without an index file, as SimpleHTTPRequestHandler renders it"""
+    try:
+        names = sorted(os.listdir(local_path), key=str.lower)
+    except OSError:
+        return None
+    try:
+        display_path = urllib.parse.unquote(url_path, errors='surrogatepass')
+    except UnicodeDecodeError:
+        display_path = urllib.parse.unquote(url_path)
+    encoding = sys.getfilesystemencoding()
+    title = f'Directory listing for {html.escape(display_path, quote=False)}'
+    lines = [
+        '<!DOCTYPE HTML>',
+        '<html lang="en">',
+        '<head>',
+        f'<meta charset="{encoding}">',
+        f'<title>{title}</title>\n</head>',
+        f'<body>\n<h1>{title}</h1>',
+        '<hr>\n<ul>',
+    ]
+    for name in names:
+        full_name = os.path.join(local_path, name)
+        display_name = link_name = name
+        if os.path.isdir(full_name):
+            display_name = link_name = name + '/'
+        if os.path.islink(full_name):
+            display_name = name + '@'
+        lines.append(f'<li><a href="{urllib.parse.quote(link_name, errors="surrogatepass")}">'
+                     f'{html.escape(display_name, quote=False)}</a></li>')
+    lines.append('</ul>\n<hr>\n</body>\n</html>\n')
+    return '\n'.join(lines).encode(encoding, 'surrogateescape')
+
+
+def serve_static(path, request_headers):
+    """GET/HEAD for DOCUMENT_ROOT: returns a ``(status, headers, body)`` tuple
+
+    ``body`` is bytes, or a SendFile the engine passes to sendfile().
+    """
+    url_path = path.split('?', 1)[0].split('#', 1)[0]
+    entry = STATIC_FILES.get(url_path)
+    if entry is None:
+        local_path = translate_static_path(url_path)
+        if not os.path.isdir(local_path):
+            return 404, [], b''
+        if not url_path.endswith('/'):
+            return 301, [('Location', url_path + '/')], b''
+        listing = render_directory_listing(url_path, local_path)
+        if listing is None:
+            return 404, [], b''
+        return 200, [('Content-type', f'text/html; charset={sys.getfilesystemencoding()}')], listing
+
+    use_gzip = entry.gzip_body is not None and accepts_gzip(request_headers.get('Accept-Encoding'))
+    etag = entry.gzip_etag if use_gzip else entry.etag
+    headers = [*entry.headers, ('ETag', etag)]
+    if not_modified(entry, etag, request_headers):
+        return 304, headers, b''
+    if use_gzip:
+        return 200, [*headers, ('Content-Encoding', 'gzip')], entry.gzip_body
+    if entry.body is not None:
+        return 200, headers, entry.body
+    try:
+        body = SendFile.from_path(entry.path)
+    except OSError:
+        return 404, [], b''
+    return 200, headers, body
+
+
+def format_response_head(status, headers, content_length, keep_alive, chunked=False):
+    lines = [
+        f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}",
+        f"Server: {RequestHandler.server_version}",
+        f"Date: {email.utils.formatdate(usegmt=True)}",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    elif content_length is not None:
+        lines.append(f"Content-Length: {content_length}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+
+def render_response(status, headers, body, keep_alive, chunked, head_only):
+    """Serialize a response to be written later, as ``(bytes, keep_alive)``
+
+    Streamed bodies are chunk-encoded when ``chunked`` (HTTP/1.1) and end
+    the connection otherwise, as both engines do when writing directly.
+    """
+    if isinstance(body, SendFile):
+        with body.file:
+            if head_only:
+                return format_response_head(status, headers, body.size, keep_alive), keep_alive
+            body = body.file.read(body.size)
+    if isinstance(body, bytes):
+        head = format_response_head(status, headers, len(body), keep_alive)
+        return (head if head_only else head + body), keep_alive
+    keep_alive = keep_alive and chunked
+    head = format_response_head(status, headers, None, keep_alive, chunked)
+    if chunked:
+        return head + b"".join(b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in body) + b"0\r\n\r\n", keep_alive
+    return head + b"".join(body), keep_alive
+
+
+async def deliver_faulty_response(fault, data, send):
+    """Wait out ``fault.delay``, then ``await send()`` the response at once or trickled"""
+    if fault.delay:
+        await asyncio.sleep(fault.delay)
+    if fault.trickle is None:
+        await send(data)
+        return
+    bytes_per_second, chunk_bytes = fault.trickle
+    for start in range(0, len(data), chunk_bytes):
+        if start:
+            await asyncio.sleep(chunk_bytes / bytes_per_second)
+        await send(data[start:start + chunk_bytes])
+
+
+async def deliver_detached(server, sock, client_address, fault, data, keep_alive):
+    """Deliver a delayed response of the threaded engine, then hand the connection back to it"""
+    loop = asyncio.get_running_loop()
+
+    async def send(chunk):
+        await loop.sock_sendall(sock, chunk)
+
+    try:
+        sock.setblocking(False)
+        await deliver_faulty_response(fault, data, send)
+        sock.setblocking(True)
+    except OSError:
+        keep_alive = False
+    if keep_alive:
+        # The next request on this connection gets a new handler thread
+        server.process_request(sock, client_address)
+    else:
+        server.shutdown_request(sock)
+
+
+class FaultLoop:
+    """Event loop thread on which the threaded engine waits out injected delays.
+
+    A delayed request detaches its connection and returns its handler
+    thread; the loop sleeps, writes the response (trickled if asked) and
+    then restarts a handler thread for the connection. Started on first use,
+    so each prefork worker gets its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def submit(self, coroutine):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="fault-loop", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+
+FAULT_LOOP = FaultLoop()
+
+
+async def serve_connection(reader, writer):
+    """Serve requests on one keep-alive connection until either side closes it"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(format_response_head(431, [], 0, False))
+                break
+
+            request_line, _, header_block = head.partition(b"\r\n")
+            try:
+                method, path, version = request_line.decode('latin-1').split()
+                headers = http.client.parse_headers(io.BytesIO(header_block))
+                content_length = int(headers.get('Content-Length') or 0)
+            except (ValueError, http.client.HTTPException):
+                writer.write(format_response_head(400, [], 0, False))
+                break
+
+            body = await reader.readexactly(content_length) if content_length else b''
+
+            connection = (headers.get('Connection') or '').lower()
+            if version == 'HTTP/1.1':
+                keep_alive = connection != 'close'
+            else:
+                keep_alive = connection == 'keep-alive'
+
+            started = time.perf_counter()
+            timings = REQUEST_STAGES.timings = {}
+            REQUEST_STAGES.operation = None
+            try:
+                with PROFILER.request():
+                    if method == 'POST':
+                        status, response_headers, response_body = handle_post(path, headers, body)
+                    elif method == 'GET' and path in GET_ROUTES:
+                        status, response_headers, response_body = GET_ROUTES[path]()
+                    elif method in ('GET', 'HEAD'):
+                        status, response_headers, response_body = serve_static(path, headers)
+                    else:
+                        status, response_headers, response_body = 501, [], b''
+            except Exception as e:
+                status, response_headers, response_body = json_response(500, {'errors': [{'message': str(e)}]})
+            # Handlers never await, so no other request has touched REQUEST_STAGES
+            REQUEST_STAGES.timings = None
+
+            fault = FAULTS.pick(path, current_operation())
+            if fault is not None:
+                if fault.status is not None:
+                    status, response_headers, response_body = fault_error_response(fault.status)
+                if fault.reset or fault.delay or fault.trickle:
+                    data, keep_alive = render_response(status, response_headers, response_body, keep_alive,
+                                                       version == 'HTTP/1.1', method == 'HEAD')
+                    timings['request'] = time.perf_counter() - started
+                    METRICS.observe(metric_route(method, path), status, timings, 0 if fault.reset else len(data))
+                    if fault.reset:
+                        writer.get_extra_info('socket').setsockopt(
+                            socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                        writer.transport.abort()
+                        break
+
+                    async def send(chunk):
+                        writer.write(chunk)
+                        await writer.drain()
+
+                    await deliver_faulty_response(fault, data, send)
+                    if not keep_alive:
+                        break
+                    continue
+
+            write_started = time.perf_counter()
+            if isinstance(response_body, bytes):
+                head = format_response_head(status, response_headers, len(response_body), keep_alive)
+                writer.writelines((head, response_body) if method != 'HEAD' else (head,))
+                written = len(response_body) if method != 'HEAD' else 0
+            elif isinstance(response_body, SendFile):
+                writer.write(format_response_head(status, response_headers, response_body.size, keep_alive))
+                written = 0
+                with response_body.file:
+                    if method != 'HEAD':
+                        await writer.drain()
+                        written = await asyncio.get_running_loop().sendfile(
+                            writer.transport, response_body.file, 0, response_body.size)
+            else:
+                # Streamed body: chunked for HTTP/1.1 clients, close-delimited otherwise
+                chunked = version == 'HTTP/1.1'
+                keep_alive = keep_alive and chunked
+                writer.write(format_response_head(status, response_headers, None, keep_alive, chunked))
+                written = 0
+                for chunk in response_body:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                    written += len(chunk)
+                    await writer.drain()
+                if chunked:
+                    writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            finished = time.perf_counter()
+            timings['write'] = finished - write_started
+            timings['request'] = finished - started
+            METRICS.observe(metric_route(method, path), status, timings, written)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+def run_asyncio_server(reuse_port=False):
+    async def main():
+        server = await asyncio.start_server(
+            serve_connection, "", PORT,
+            backlog=ThreadedTCPServer.request_queue_size,
+            reuse_address=True,
+            reuse_port=reuse_port,
+            limit=MAX_HEADER_BYTES,
+        )
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def run_threaded_server(reuse_port=False):
+    with ThreadedTCPServer(("", PORT), RequestHandler, bind_and_activate=False) as httpd:
+        if reuse_port:
+            httpd.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        httpd.server_bind()
+        httpd.server_activate()
+        print(f"Multi-threaded server ready for high concurrency (queue size: {httpd.request_queue_size})")
+        httpd.serve_forever()
+
+
+def run_prefork(engine, workers):
+    """Fork ``workers`` processes that each bind PORT with SO_REUSEPORT.
+
+    Data store sharing policy:
+      - USERS: read-only, inherited from the parent
+      - POSTS, TRANSFER_VOUCHERS: per-process; each worker keeps its own
+        writes, with strided ID counters so IDs stay unique across workers;
+        with DATA_DIR each worker logs and snapshots its own writes
+      - AUTH_TOKENS: shared through a SharedTokenTable, so a login served by
+        one worker is accepted by all of them
+      - METRICS: one shared-memory slot per worker, summed by /metrics
+    """
+    global AUTH_TOKENS
+    AUTH_TOKENS = SharedTokenTable(AUTH_TOKEN_TTL, AUTH_TOKEN_MAX)
+    METRICS.share(workers)
+
+    children = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_prefork_worker(engine, index, workers)
+            except KeyboardInterrupt:
+                pass
+            except Exception:
+                logger.exception("prefork worker %d failed", index)
+                status = 1
+            finally:
+                os._exit(status)
+        children.append(pid)
+
+    def stop_children(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop_children)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        stop_children(signal.SIGINT, None)
+        for pid in children:
+            os.waitpid(pid, 0)
+        raise
+
+
+def run_prefork_worker(engine, index, workers):
+    POST_IDS.stride(index, workers)
+    VOUCHER_IDS.stride(index, workers)
+    METRICS.use_slot(index)
+    print(f"Worker {index} (pid {os.getpid()}) listening on port {PORT}", flush=True)
+    # Profiler and snapshot threads don't survive fork(), so each worker starts its own
+    PROFILER.start(PROFILE_MODE)
+    if DATA_DIR:
+        DATA_LOG.open(DATA_DIR, index)
+    try:
+        SERVER_ENGINES[engine](reuse_port=True)
+    finally:
+        PROFILER.stop()
+        DATA_LOG.close()
+
+
+SERVER_ENGINES = {
+    "threaded": run_threaded_server,
+    "asyncio": run_asyncio_server,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock HTTP/GraphQL server for Locust load tests")
+    parser.add_argument("--mode", choices=sorted(SERVER_ENGINES), default=SERVER_MODE,
+                        help="serving engine (default: $SERVER_MODE or threaded)")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="prefork worker processes, 0 = one per CPU (default: $SERVER_WORKERS or 1)")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    print(f"Serving HTTP on port {PORT} ({args.mode} engine, {workers} worker process(es))")
+    print(f"Document root: {os.path.abspath(DOCUMENT_ROOT)}")
+    print(f"Access at: http://localhost:{PORT}")
+    print("Endpoints:")
+    print("  - /api/auth/login (POST) - Employee authentication")
+    print("  - /api/graphql (POST) - GraphQL API with auth (transfer vouchers)")
+    print("  - /login (POST) - Basic login")
+    print("  - /graphql (POST) - GraphQL API (posts)")
+    print("  - /stats, /metrics (GET) - Data store stats, Prometheus metrics")
+    print("  - /admin/profile (GET, POST) - Profiler status / switch profiling mode")
+    print("  - /admin/faults (GET, POST) - Fault injection rules and counters / replace the rules")
+    seed_data_stores()
+    if FAULTS_FILE:
+        FAULTS.configure(load_fault_rules(FAULTS_FILE))
+        print(f"Fault injection: {len(FAULTS.rules)} rule(s) from {FAULTS_FILE}")
+    if DATA_DIR:
+        load_persisted_data()
+    if workers > 1:
+        print("Prefork mode: POSTS/TRANSFER_VOUCHERS are per-process, AUTH_TOKENS are shared")
+    # SIGTERM (docker stop) shuts down like Ctrl-C, so final profiles get written
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        if workers > 1:
+            run_prefork(args.mode, workers)
+        else:
+            PROFILER.start(PROFILE_MODE)
+            if DATA_DIR:
+                DATA_LOG.open(DATA_DIR, 0)
+            SERVER_ENGINES[args.mode]()
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
+    finally:
+        PROFILER.stop()
+        DATA_LOG.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Concurrency stress check for the mock server's mutation path.
+
+Runs createPost and createTransferVouchers from many threads at once (with a
+tiny thread switch interval to force interleaving) and verifies that no
+write was lost or duplicated: every returned id is unique, every created
+row is readable from its store under that id, and every voucher index
+lists each voucher exactly once, in insertion order. Reader threads run
+filtered selections alongside the writers and verify that each selection
+yields exactly ``len(selection)`` distinct matching rows.
+
+    python3 stress_mutations.py [--threads 64] [--iterations 200] [--readers 4]
+"""
+import argparse
+import json
+import sys
+import threading
+
+import server
+
+CREATE_POST = 'mutation { createPost(title: "Stress", content: "t%d-%d", authorId: "1") { id } }'
+CREATE_VOUCHERS = (
+    'mutation { createTransferVouchers(inputs: [%s]) { id } }'
+)
+VOUCHER_INPUT = (
+    '{shippingStoreCode: %d, arrivalStoreCode: %d, shippingDate: "2025-12-01", planDeliveryDate: "2025-12-05", '
+    'shippingQuantity: "2", shippingSellingPrice: "100", jan: "490000000%04d"}'
+)
+
+
+def worker(thread_index, iterations, vouchers_per_call, results, barrier):
+    barrier.wait()
+    post_ids, voucher_ids = [], []
+    for i in range(iterations):
+        result = json.loads(server.execute_graphql(CREATE_POST % (thread_index, i)))
+        post_ids.append(result["data"]["createPost"]["id"])
+        inputs = ", ".join(VOUCHER_INPUT % (9000 + thread_index % 7, 9100 + i % 5, i) for _ in range(vouchers_per_call))
+        result = json.loads(server.execute_graphql(CREATE_VOUCHERS % inputs))
+        voucher_ids.extend(v["id"] for v in result["data"]["createTransferVouchers"])
+    results[thread_index] = (post_ids, voucher_ids)
+
+
+def reader(reader_index, done, problems, barrier):
+    barrier.wait()
+    store = server.TRANSFER_VOUCHERS
+    reads = 0
+    while not done.is_set():
+        filters = {"shippingStoreCode": 9000 + (reader_index + reads) % 7}
+        if reads % 2:
+            filters["arrivalStoreCode"] = 9100 + reads % 5
+        selection = store.select(**filters)
+        expected = len(selection)
+        rows = list(selection)
+        ids = {row["id"] for row in rows}
+        if len(rows) != expected or len(ids) != expected:
+            problems.append(f"select({filters}): len {expected}, yielded {len(rows)} rows, {len(ids)} distinct")
+        if any(row[field] != value for row in rows for field, value in filters.items()):
+            problems.append(f"select({filters}): yielded a row that does not match")
+        reads += 1
+
+
+def check_indexes(store):
+    """Every row appears once per indexed field, under its own value, in order"""
+    problems = []
+    for field, index in store._indexes.items():
+        seen = 0
+        for value, posting in index.items():
+            positions = list(posting)
+            if positions != sorted(set(positions)):
+                problems.append(f"{field}={value!r}: posting list unsorted or duplicated")
+            for position in positions:
+                if store._value(position, field) != value:
+                    problems.append(f"{field}={value!r}: position {position} holds another value")
+            seen += len(positions)
+        if seen != len(store):
+            problems.append(f"{field}: index covers {seen} rows, store has {len(store)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--vouchers-per-call", type=int, default=3)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    sys.setswitchinterval(1e-6)
+    posts_before, vouchers_before = len(server.POSTS), len(server.TRANSFER_VOUCHERS)
+    results = [None] * args.threads
+    read_problems = []
+    done = threading.Event()
+    barrier = threading.Barrier(args.threads + args.readers)
+    threads = [
+        threading.Thread(target=worker, args=(i, args.iterations, args.vouchers_per_call, results, barrier))
+        for i in range(args.threads)
+    ]
+    readers = [threading.Thread(target=reader, args=(i, done, read_problems, barrier)) for i in range(args.readers)]
+    for thread in threads + readers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    post_ids = [post_id for posts, _ in results for post_id in posts]
+    voucher_ids = [voucher_id for _, vouchers in results for voucher_id in vouchers]
+    expected_posts = args.threads * args.iterations
+    expected_vouchers = expected_posts * args.vouchers_per_call
+
+    problems = []
+    if len(set(post_ids)) != expected_posts:
+        problems.append(f"posts: {expected_posts - len(set(post_ids))} duplicate ids returned")
+    if len(set(voucher_ids)) != expected_vouchers:
+        problems.append(f"vouchers: {expected_vouchers - len(set(voucher_ids))} duplicate ids returned")
+    if len(server.POSTS) - posts_before != expected_posts:
+        problems.append(f"posts: store grew by {len(server.POSTS) - posts_before}, expected {expected_posts}")
+    if len(server.TRANSFER_VOUCHERS) - vouchers_before != expected_vouchers:
+        problems.append(f"vouchers: store grew by {len(server.TRANSFER_VOUCHERS) - vouchers_before}, "
+                        f"expected {expected_vouchers}")
+    problems += [f"post {post_id} not readable" for post_id in post_ids if post_id not in server.POSTS]
+    problems += [f"voucher {voucher_id} not readable" for voucher_id in voucher_ids
+                 if voucher_id not in server.TRANSFER_VOUCHERS]
+    problems += check_indexes(server.TRANSFER_VOUCHERS)
+    problems += read_problems
+
+    print(f"{args.threads} threads x {args.iterations} iterations: "
+          f"{len(post_ids)} posts, {len(voucher_ids)} vouchers created")
+    if problems:
+        for problem in problems[:20]:
+            print(f"FAIL: {problem}")
+        if len(problems) > 20:
+            print(f"... and {len(problems) - 20} more")
+        sys.exit(1)
+    print("OK: no lost or duplicate writes")
+
+
+if __name__ == "__main__":
+    main()
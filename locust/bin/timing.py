@@ -0,0 +1,151 @@
+"""Shared latency timing layer for the locustfiles.
+
+Importing this module records every Locust request event into a per-entry
+(request type + name) HDR histogram with microsecond resolution. Workers
+ship their histograms to the master with each stats report, where they are
+merged; at the end of a test the master (or a standalone run) writes them
+next to the CSV files (the directory of ``--csv``, i.e. locust/logs/<ts>/):
+
+    hdr_summary.csv        count, min, mean, p50 ... p99.99, max per entry (ms)
+    hdr_histograms.json    raw bucket counts, mergeable across runs
+    hdr/<entry>.hgrm       HdrHistogram-style percentile distributions
+
+In open-model mode (open_model.ARRIVAL_RATE) each entry also gets a
+"corrected" histogram, where every request of a task that started late is
+recorded with that task's schedule lag added (coordinated-omission
+correction).
+
+Custom request events should be timed with ``now_ns()`` / ``elapsed_ms()``,
+which use the monotonic perf_counter_ns clock and keep sub-millisecond
+precision.
+"""
+import csv
+import json
+import logging
+import os
+import re
+from time import perf_counter_ns
+
+import gevent
+import open_model
+from hdr import Histogram
+from locust.runners import MasterRunner, WorkerRunner
+
+from locust import events
+
+logger = logging.getLogger(__name__)
+
+# Seconds the master waits after test_stop for the workers' final reports
+# before writing the histograms (they are written again on quit).
+HDR_EXPORT_GRACE = float(os.getenv("HDR_EXPORT_GRACE", "5"))
+
+SUMMARY_PERCENTILES = (50, 90, 99, 99.9, 99.99)
+
+
+def now_ns():
+    return perf_counter_ns()
+
+
+def elapsed_ms(start_ns):
+    """Milliseconds since ``start_ns`` (a now_ns() value), as a float"""
+    return (perf_counter_ns() - start_ns) / 1_000_000
+
+
+# (request_type, name, variant) -> Histogram; variant is "raw" or "corrected"
+HISTOGRAMS = {}
+
+
+def histogram(request_type, name, variant="raw"):
+    key = (request_type, name, variant)
+    entry = HISTOGRAMS.get(key)
+    if entry is None:
+        entry = HISTOGRAMS[key] = Histogram()
+    return entry
+
+
+@events.request.add_listener
+def record_request(request_type, name, response_time, **kwargs):
+    if response_time is None:
+        return
+    value = response_time * 1000
+    histogram(request_type, name).record(value)
+    if open_model.ARRIVAL_RATE > 0 and request_type != "Open model":
+        histogram(request_type, name, "corrected").record(value + open_model.current_lag() * 1_000_000)
+
+
+@events.test_start.add_listener
+def reset_histograms(**kwargs):
+    HISTOGRAMS.clear()
+
+
+@events.report_to_master.add_listener
+def send_histograms(client_id, data):
+    data["hdr_histograms"] = [[*key, entry.to_dict()] for key, entry in HISTOGRAMS.items()]
+    HISTOGRAMS.clear()
+
+
+@events.worker_report.add_listener
+def merge_histograms(client_id, data):
+    for request_type, name, variant, entry in data.get("hdr_histograms", ()):
+        histogram(request_type, name, variant).merge(Histogram.from_dict(entry))
+
+
+def export_directory(environment):
+    csv_prefix = getattr(environment.parsed_options, "csv_prefix", None)
+    if not csv_prefix:
+        return None
+    return os.path.dirname(os.path.abspath(csv_prefix))
+
+
+def entry_filename(request_type, name, variant):
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{request_type}_{name}").strip("_")
+    return f"{slug}_{variant}.hgrm" if variant != "raw" else f"{slug}.hgrm"
+
+
+def export_histograms(directory):
+    """Write the summary CSV, mergeable JSON and .hgrm files for HISTOGRAMS"""
+    entries = sorted(HISTOGRAMS.items())
+    os.makedirs(os.path.join(directory, "hdr"), exist_ok=True)
+    with open(os.path.join(directory, "hdr_summary.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Type", "Name", "Variant", "Count", "Min", "Mean",
+                         *(f"p{percentile:g}" for percentile in SUMMARY_PERCENTILES), "Max"])
+        for (request_type, name, variant), entry in entries:
+            writer.writerow([request_type, name, variant, entry.total, f"{(entry.min or 0) / 1000:.3f}",
+                             f"{entry.mean() / 1000:.3f}",
+                             *(f"{entry.value_at_percentile(p) / 1000:.3f}" for p in SUMMARY_PERCENTILES),
+                             f"{(entry.max or 0) / 1000:.3f}"])
+    with open(os.path.join(directory, "hdr_histograms.json"), "w") as f:
+        json.dump({"unit": "us", "subBucketBits": Histogram.SUB_BUCKET_BITS, "entries": [
+            {"type": request_type, "name": name, "variant": variant, **entry.to_dict()}
+            for (request_type, name, variant), entry in entries
+        ]}, f)
+    for (request_type, name, variant), entry in entries:
+        with open(os.path.join(directory, "hdr", entry_filename(request_type, name, variant)), "w") as f:
+            f.write(entry.percentile_distribution())
+
+
+def export_for(environment):
+    if isinstance(environment.runner, WorkerRunner) or not HISTOGRAMS:
+        return
+    directory = export_directory(environment)
+    if directory is None:
+        return
+    try:
+        export_histograms(directory)
+        logger.info(f"HDR histograms written to {directory}")
+    except OSError as e:
+        logger.error(f"Failed to write HDR histograms to {directory}: {e}")
+
+
+@events.test_stop.add_listener
+def export_on_stop(environment, **kwargs):
+    if isinstance(environment.runner, MasterRunner):
+        gevent.spawn_later(HDR_EXPORT_GRACE, export_for, environment)
+    else:
+        export_for(environment)
+
+
+@events.quitting.add_listener
+def export_on_quit(environment, **kwargs):
+    export_for(environment)